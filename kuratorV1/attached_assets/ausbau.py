@@ -334,11 +334,11 @@ class Ausbau(commands.Cog):
         spreadsheet_id = "1quKEnSHhzW_z4MCJkoQhYuorB9S5OdmMEntAPdFT1a8"
         
         # Verwende die dedizierte Funktion aus dem sheets-Modul
-        from utils.sheets import log_ausbau_to_sheet as log_to_sheet
+        from utils.sheets import log_ausbau_to_sheet_async as log_to_sheet
         
         try:
             # Rufe die Funktion aus dem sheets-Modul auf
-            success = log_to_sheet(
+            success = await log_to_sheet(
                 spreadsheet_id, 
                 land, 
                 ausbau_art, 
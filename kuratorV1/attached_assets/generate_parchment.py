@@ -1,69 +1,63 @@
-from PIL import Image, ImageDraw, ImageFilter
-import random
+from PIL import Image, ImageFilter
+import functools
 import numpy as np
-from io import BytesIO
 
-def generate_parchment_background(width=1000, height=1400):
+@functools.lru_cache(maxsize=8)
+def edge_vignette(width, height):
+    """Darkening towards the edges as a (height, width) array, computed once per canvas size"""
+    xs = np.arange(width)
+    ys = np.arange(height)
+    edge_x = np.minimum(xs, width - xs) / (width / 10)
+    edge_y = np.minimum(ys, height - ys) / (height / 10)
+    edge_factor = np.minimum(edge_y[:, None], edge_x[None, :])
+    vignette = np.where(edge_factor < 1, (1 - edge_factor) * 40, 0.0)
+    vignette.flags.writeable = False
+    return vignette
+
+@functools.lru_cache(maxsize=None)
+def stain_falloff(radius):
+    """Radial falloff 1 - distance/radius over the stain's bounding square, 0 outside the circle"""
+    offsets = np.arange(-radius, radius)
+    distance = np.sqrt(offsets[:, None] ** 2 + offsets[None, :] ** 2)
+    falloff = np.where(distance <= radius, 1 - distance / radius, 0.0)
+    falloff.flags.writeable = False
+    return falloff
+
+def generate_parchment_background(width=1000, height=1400, seed=None):
     """Generate a parchment-like background texture"""
-    # Base color (light tan)
-    parchment = Image.new('RGB', (width, height), (215, 190, 140))
-    draw = ImageDraw.Draw(parchment)
-    
-    # Add noise for texture
-    for x in range(width):
-        for y in range(height):
-            # Random variation in color
-            noise = random.randint(-20, 20)
-            r = min(max(215 + noise, 180), 230)
-            g = min(max(190 + noise, 160), 210)
-            b = min(max(140 + noise, 100), 160)
-            
-            # Apply darker areas to edges
-            edge_x = min(x, width - x) / (width / 10)
-            edge_y = min(y, height - y) / (height / 10)
-            edge_factor = min(edge_x, edge_y)
-            if edge_factor < 1:
-                darkening = (1 - edge_factor) * 40
-                r = max(r - darkening, 100)
-                g = max(g - darkening, 80)
-                b = max(b - darkening, 50)
-            
-            draw.point((x, y), fill=(int(r), int(g), int(b)))
-    
-    # Add some random darker spots and stains
+    rng = np.random.default_rng(seed)
+
+    # Base color (light tan) with random variation for texture
+    noise = rng.integers(-20, 21, size=(height, width))
+    pixels = np.empty((height, width, 3))
+    for channel, (base, low, high) in enumerate(((215, 180, 230), (190, 160, 210), (140, 100, 160))):
+        pixels[:, :, channel] = np.clip(base + noise, low, high)
+
+    # Apply darker areas to edges
+    vignette = edge_vignette(width, height)[:, :, None]
+    pixels = np.maximum(pixels - vignette, (100, 80, 50)).astype(np.int32)
+
+    # Add some random darker spots and stains, each on top of the previous ones
     for _ in range(100):
-        x = random.randint(0, width - 1)
-        y = random.randint(0, height - 1)
-        radius = random.randint(3, 30)
-        color_shift = random.randint(-50, -20)
-        
-        for i in range(x - radius, x + radius):
-            for j in range(y - radius, y + radius):
-                if 0 <= i < width and 0 <= j < height:
-                    distance = ((i - x) ** 2 + (j - y) ** 2) ** 0.5
-                    if distance <= radius:
-                        # Get current pixel color
-                        pixel = parchment.getpixel((i, j))
-                        fade = 1 - (distance / radius)
-                        # Apply darker shade
-                        new_color = (
-                            max(0, int(pixel[0] + color_shift * fade)),
-                            max(0, int(pixel[1] + color_shift * fade)),
-                            max(0, int(pixel[2] + color_shift * fade))
-                        )
-                        draw.point((i, j), fill=new_color)
-    
+        x = int(rng.integers(0, width))
+        y = int(rng.integers(0, height))
+        radius = int(rng.integers(3, 31))
+        color_shift = int(rng.integers(-50, -19))
+
+        falloff = stain_falloff(radius)
+        x0, y0 = max(0, x - radius), max(0, y - radius)
+        x1, y1 = min(width, x + radius), min(height, y + radius)
+        mask = falloff[y0 - (y - radius):y1 - (y - radius), x0 - (x - radius):x1 - (x - radius)]
+        region = pixels[y0:y1, x0:x1]
+        # int() truncation and max(0, ...) as in the per-pixel version
+        region[:] = np.maximum(0, (region + color_shift * mask[:, :, None]).astype(np.int32))
+
+    parchment = Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
     # Apply slight blur for a more natural look
-    parchment = parchment.filter(ImageFilter.GaussianBlur(radius=1))
-    
-    # Save to BytesIO object
-    img_byte_arr = BytesIO()
-    parchment.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    
-    return parchment
+    return parchment.filter(ImageFilter.GaussianBlur(radius=1))
 
 if __name__ == "__main__":
     # Test generate
     bg = generate_parchment_background()
-    bg.save("parchment_test.png")
\ No newline at end of file
+    bg.save("parchment_test.png")
@@ -1,5 +1,6 @@
 import os
 import json
+import functools
 from datetime import datetime
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -14,7 +15,11 @@ def get_sheets_service():
     if not creds_json:
         logger.error("Google service account credentials not found")
         return None
-    
+    return _build_service(creds_json)
+
+@functools.lru_cache(maxsize=1)
+def _build_service(creds_json):
+    # Validated and built once per credentials string instead of for every row
     try:
         # Clean and validate the JSON string
         if not creds_json:
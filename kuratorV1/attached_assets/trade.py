@@ -5,6 +5,7 @@ from discord.ext import commands
 from utils.logger import setup_logger
 from datetime import datetime
 from utils.image_generator import generate_trade_agreement_image
+from utils.publishing import publish_document
 import io
 from io import BytesIO
 
@@ -179,6 +180,14 @@ class Trade(commands.Cog):
                         ephemeral=True
                     )
 
+        except Exception as e:
+            logger.error(f"Error creating trade agreement: {str(e)}")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(
+                    "Ein Fehler ist aufgetreten. Bitte versuche es später erneut.",
+                    ephemeral=True
+                )
+
     async def send_trade_confirmation(self, trade_id: str, initiator: discord.Member, partner: discord.Member, embed: discord.Embed):
         try:
             # Einmalige Nachricht an den Initiator
@@ -329,7 +338,7 @@ class Trade(commands.Cog):
                 vertragsbruch_klausel = trade.get("vertragsbruch_klausel")
                 anmerkungen = trade.get("anmerkungen")
 
-                trade_image = generate_trade_agreement_image(
+                trade_pages = generate_trade_agreement_image(
                     initiator_name=initiator.display_name,
                     partner_name=partner.display_name,
                     initiator_country=initiator_country,
@@ -340,50 +349,35 @@ class Trade(commands.Cog):
                     request_amount=request_amount,
                     timestamp=datetime.now(),
                     vertragsbruch_klausel=vertragsbruch_klausel,
-                    anmerkungen=anmerkungen
+                    anmerkungen=anmerkungen,
+                    pages=True
                 )
 
-                # Prepare the file for Discord
-                trade_image_file = discord.File(trade_image, filename="handelsvertrag.png")
-
-                # Sende eine Ankündigung mit dem Bild in den Channel
-                await announcement_channel.send(
-                    f"📜 **Handelsvertrag ratifiziert** 📜\n\n"
-                    f"Die ehrenwerten Reiche {initiator_country} ({initiator.mention}) und {partner_country} ({partner.mention}) "
-                    f"haben einen feierlichen Handelsvertrag geschlossen. Möge dieser Austausch "
-                    f"von Waren den Wohlstand beider Reiche fördern.",
-                    file=trade_image_file
-                )
-
-                # Verwende dasselbe Bild für beide DMs, um doppelte Generierung zu vermeiden
-                # Erstelle Kopien des ursprünglichen Bildes
-                trade_image.seek(0)  # Zurück zum Anfang des BytesIO-Objekts
-                initiator_file = discord.File(BytesIO(trade_image.getvalue()), filename="handelsvertrag.png")
-
-                trade_image.seek(0)  # Zurück zum Anfang des BytesIO-Objekts
-                partner_file = discord.File(BytesIO(trade_image.getvalue()), filename="handelsvertrag.png")
-
-                # Sende das Bild mit einer Nachricht an jeden Herrscher
-                # Historische Nachricht für den Initiator
-                await initiator.send(
-                    f"✅ **Handelsvertrag ratifiziert**\n\n"
-                    f"Eure Exzellenz, Herrscher von {initiator_country},\n\n"
-                    f"Mit großer Freude verkünden wir, dass der Handelsvertrag mit dem Reich {partner_country} "
-                    f"von beiden Parteien ratifiziert wurde. Die vereinbarten Handelswege werden umgehend geöffnet, "
-                    f"und der Austausch von Waren wird unverzüglich beginnen.\n\n"
-                    f"Eine formelle Kopie des Dokuments wurde in Euren königlichen Handelsarchiven hinterlegt.",
-                    file=initiator_file
-                )
+                # Einmal gerendert, an den Ankündigungs-Channel und beide Herrscher
+                def ratification_message(own_country, other_country):
+                    return (
+                        f"✅ **Handelsvertrag ratifiziert**\n\n"
+                        f"Eure Exzellenz, Herrscher von {own_country},\n\n"
+                        f"Mit großer Freude verkünden wir, dass der Handelsvertrag mit dem Reich {other_country} "
+                        f"von beiden Parteien ratifiziert wurde. Die vereinbarten Handelswege werden umgehend geöffnet, "
+                        f"und der Austausch von Waren wird unverzüglich beginnen.\n\n"
+                        f"Eine formelle Kopie des Dokuments wurde in Euren königlichen Handelsarchiven hinterlegt."
+                    )
 
-                # Historische Nachricht für den Partner
-                await partner.send(
-                    f"✅ **Handelsvertrag ratifiziert**\n\n"
-                    f"Eure Exzellenz, Herrscher von {partner_country},\n\n"
-                    f"Mit großer Freude verkünden wir, dass der Handelsvertrag mit dem Reich {initiator_country} "
-                    f"von beiden Parteien ratifiziert wurde. Die vereinbarten Handelswege werden umgehend geöffnet, "
-                    f"und der Austausch von Waren wird unverzüglich beginnen.\n\n"
-                    f"Eine formelle Kopie des Dokuments wurde in Euren königlichen Handelsarchiven hinterlegt.",
-                    file=partner_file
+                await publish_document(
+                    [page.getvalue() for page in trade_pages],
+                    "handelsvertrag.png",
+                    [
+                        (initiator, ratification_message(initiator_country, partner_country)),
+                        (partner, ratification_message(partner_country, initiator_country)),
+                    ],
+                    archive=announcement_channel,
+                    archive_content=(
+                        f"📜 **Handelsvertrag ratifiziert** 📜\n\n"
+                        f"Die ehrenwerten Reiche {initiator_country} ({initiator.mention}) und {partner_country} ({partner.mention}) "
+                        f"haben einen feierlichen Handelsvertrag geschlossen. Möge dieser Austausch "
+                        f"von Waren den Wohlstand beider Reiche fördern."
+                    )
                 )
 
             except Exception as e:
@@ -6,6 +6,7 @@ from utils.logger import setup_logger
 import asyncio
 from io import BytesIO
 from utils.image_generator import generate_treaty_image
+from utils.publishing import document_files
 
 logger = setup_logger()
 
@@ -284,7 +285,7 @@ class Treaties(commands.Cog):
                 from utils.image_generator import generate_treaty_image
 
                 # Erstelle das Vertragsbild
-                treaty_image = generate_treaty_image(
+                treaty_pages = generate_treaty_image(
                     initiator_name=initiator.display_name,
                     partner_name=partner.display_name,
                     initiator_country=initiator_country,
@@ -292,28 +293,20 @@ class Treaties(commands.Cog):
                     treaty_type=treaty_type,
                     expiry_date=treaty["expiry_date"],
                     vertragsbruch_klausel=vertragsbruch_klausel,
-                    anmerkungen=anmerkungen
+                    anmerkungen=anmerkungen,
+                    pages=True
                 )
-
-                # Bereite die Datei für Discord vor
-                treaty_image_file = discord.File(treaty_image, filename="vertrag.png")
+                # Lange Verträge haben mehrere Seiten; jede Nachricht bekommt alle
+                treaty_pages = [page.getvalue() for page in treaty_pages]
 
                 # Sende eine Ankündigung mit dem Bild in den Channel
                 await announcement_channel.send(
                     f"📜 **{treaty_type} ratifiziert** 📜\n\n"
                     f"Die ehrenwerten Reiche {initiator_country} ({initiator.mention}) und {partner_country} ({partner.mention}) "
                     f"haben einen feierlichen Vertrag geschlossen.",
-                    file=treaty_image_file
+                    files=document_files(treaty_pages, "vertrag.png")
                 )
 
-                # Verwende dasselbe Bild für beide DMs, um doppelte Generierung zu vermeiden
-                # Erstelle Kopien des ursprünglichen Bildes
-                treaty_image.seek(0)  # Zurück zum Anfang des BytesIO-Objekts
-                initiator_file = discord.File(BytesIO(treaty_image.getvalue()), filename="vertrag.png")
-
-                treaty_image.seek(0)  # Zurück zum Anfang des BytesIO-Objekts
-                partner_file = discord.File(BytesIO(treaty_image.getvalue()), filename="vertrag.png")
-
                 # Historische Nachrichten basierend auf Vertragstyp
                 messages = {
                     "Nichtangriffspakt": 
@@ -362,11 +355,11 @@ class Treaties(commands.Cog):
 
                 # Sende historische Nachricht an den Initiator
                 initiator_message = messages.get(treaty_type, default_message)
-                await initiator.send(initiator_message, file=initiator_file)
+                await initiator.send(initiator_message, files=document_files(treaty_pages, "vertrag.png"))
 
                 # Ersetze den Ländernamen für die Nachricht an den Partner
                 partner_message = messages.get(treaty_type, default_message).replace(initiator_country, partner_country).replace(partner_country, initiator_country)
-                await partner.send(partner_message, file=partner_file)
+                await partner.send(partner_message, files=document_files(treaty_pages, "vertrag.png"))
 
             except Exception as e:
                 logger.error(f"Failed to generate treaty image: {str(e)}")
@@ -0,0 +1,274 @@
+"""
+Rendering benchmark suite for utils/image_generator.
+
+Times and memory-profiles the parchment background, trade agreements and all treaty
+types with varying canvas sizes and text lengths, and writes a JSON report.
+
+    python benchmark_rendering.py --output bench.json
+    python benchmark_rendering.py --baseline bench.json --threshold 0.25
+
+With --baseline the run fails (exit code 1) when a benchmark's mean time grows by more
+than the threshold compared to the baseline report.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw, ImageFilter
+from utils import image_generator
+from utils.image_generator import (
+    OUTPUT_PROFILES, VECTOR_FORMATS, BackgroundPool, ParchmentTexture, background_pool, compiled_layout, encode_image,
+    generate_parchment_background, generate_trade_agreement_image, generate_treaty_image
+)
+from utils.layout import TREATY_EXPLANATIONS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CANVAS_SIZES = ((400, 550), (800, 1100), (1000, 1400))
+
+CLAUSE = (
+    "Bei Vertragsbruch zahlt die schuldige Partei das Doppelte des vereinbarten Wertes "
+    "und tritt ein Grenzgebiet nach Wahl der geschädigten Partei ab. "
+)
+# Wiederholungen von CLAUSE für Klausel und Anmerkungen
+TEXT_LENGTHS = {"empty": 0, "short": 1, "long": 5}
+
+def legacy_parchment_background(width=800, height=1100):
+    """Per-pixel reference implementation, kept for before/after comparisons"""
+    base_color = (240, 230, 200)
+    img = Image.new('RGB', (width, height), base_color)
+    draw = ImageDraw.Draw(img)
+
+    for y in range(height):
+        for x in range(width):
+            noise = random.randint(-10, 10)
+            edge_darken = max(0, int(30 * (1 - min(x, width-x, y, height-y) / 150)))
+            r, g, b = base_color
+            r = max(0, min(255, r + noise - edge_darken))
+            g = max(0, min(255, g + noise - edge_darken))
+            b = max(0, min(255, b + noise - edge_darken))
+            if x % 4 == 0 and y % 4 == 0:
+                draw.point((x, y), fill=(r, g, b))
+
+    for _ in range(40):
+        x = random.randint(0, width)
+        y = random.randint(0, height)
+        radius = random.randint(5, 50)
+        opacity = random.randint(5, 20)
+        color = (200 - random.randint(0, 30), 190 - random.randint(0, 40), 160 - random.randint(0, 40))
+        for r in range(radius):
+            draw.ellipse((x-r, y-r, x+r, y+r), fill=color + (opacity,))
+
+    return img.filter(ImageFilter.GaussianBlur(radius=1))
+
+def load_attached_parchment():
+    """Import generate_parchment_background from attached_assets/generate_parchment.py"""
+    path = os.path.join(BASE_DIR, "attached_assets", "generate_parchment.py")
+    spec = importlib.util.spec_from_file_location("attached_generate_parchment", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.generate_parchment_background
+
+def time_function(func, repeat):
+    """Return the best and mean runtime of func in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), sum(timings) / len(timings)
+
+def peak_memory(func):
+    """Peak Python/NumPy allocation of one call in KiB (Pillow's own image buffers are not traced)"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+def measure(results, name, func, repeat, warm_up=True):
+    if warm_up:
+        func()  # Pool, kompilierte Layouts und Schriften vorab laden
+    best, mean = time_function(func, repeat)
+    result = {
+        "best_ms": round(best, 2),
+        "mean_ms": round(mean, 2),
+        "peak_kib": round(peak_memory(func), 1),
+        "repeat": repeat,
+    }
+    results[name] = result
+    print(f"  {name:40s} best {best:8.1f} ms  mean {mean:8.1f} ms  peak {result['peak_kib']:9.1f} KiB")
+    return result
+
+def benchmark_backgrounds(results, repeat, slow):
+    print("Parchment backgrounds")
+    for width, height in CANVAS_SIZES:
+        measure(results, f"background/{width}x{height}",
+                lambda: generate_parchment_background(width, height, seed=0), repeat)
+    measure(results, "background/pool_cut/800x1100", lambda: background_pool.get(0, 1100), repeat)
+    if slow:
+        measure(results, "background/legacy_loop/800x1100", legacy_parchment_background, 1, warm_up=False)
+        attached = load_attached_parchment()
+        measure(results, "background/attached_assets/1000x1400", attached, 1, warm_up=False)
+
+def trade_fields(length):
+    text = CLAUSE * TEXT_LENGTHS[length]
+    return dict(
+        initiator_name="Friedrich", partner_name="Katharina",
+        initiator_country="Preußen", partner_country="Russland",
+        offer_resource="Eisen", offer_amount=120,
+        request_resource="Holz", request_amount=300,
+        timestamp="01.01.2026, 12:00 Uhr",
+        vertragsbruch_klausel=text, anmerkungen=text,
+    )
+
+def treaty_fields(treaty_type, length):
+    text = CLAUSE * TEXT_LENGTHS[length]
+    return dict(
+        initiator_name="Friedrich", partner_name="Katharina",
+        initiator_country="Preußen", partner_country="Russland",
+        treaty_type=treaty_type, expiry_date="7 Tage (bis 08.01.2026)",
+        vertragsbruch_klausel=text, anmerkungen=text, signing_date="01.01.2026",
+    )
+
+def benchmark_documents(results, repeat):
+    print("Documents (PNG, seeded background)")
+    for length in TEXT_LENGTHS:
+        fields = trade_fields(length)
+        measure(results, f"trade/{length}",
+                lambda: generate_trade_agreement_image(**fields, seed=1, pages=True), repeat)
+    for treaty_type in TREATY_EXPLANATIONS:
+        for length in TEXT_LENGTHS:
+            fields = treaty_fields(treaty_type, length)
+            measure(results, f"treaty/{treaty_type}/{length}",
+                    lambda: generate_treaty_image(**fields, seed=1, pages=True), repeat)
+
+    print("Previews (half resolution, tier default encoding)")
+    fields = trade_fields("short")
+    measure(results, "preview/trade/short",
+            lambda: generate_trade_agreement_image(**fields, seed=1, quality="preview", pages=True), repeat)
+    fields = treaty_fields("Allianzvertrag", "short")
+    measure(results, "preview/treaty/Allianzvertrag/short",
+            lambda: generate_treaty_image(**fields, seed=1, quality="preview", pages=True), repeat)
+
+def benchmark_encoding(results, repeat):
+    img = compiled_layout("trade").render(trade_fields("short"), lambda page, height: background_pool.get(page, height))[0]
+
+    print("Encoding a rendered trade agreement")
+    for name, profile in OUTPUT_PROFILES.items():
+        if profile.format in VECTOR_FORMATS:
+            continue
+        result = measure(results, f"encode/{name}", lambda: encode_image(img, name), repeat)
+        result["bytes"] = len(encode_image(img, name).getvalue())
+
+    print("Vector output (whole document, no rasterization)")
+    for name, profile in OUTPUT_PROFILES.items():
+        if profile.format not in VECTOR_FORMATS:
+            continue
+        for length in ("short", "long"):
+            fields = treaty_fields("Allianzvertrag", length)
+            render = lambda: generate_treaty_image(**fields, seed=1, output_profile=name, pages=True)
+            result = measure(results, f"vector/{name}/{length}", render, repeat)
+            result["bytes"] = sum(len(page.getvalue()) for page in render())
+
+def check_determinism():
+    """Seeded renders must be byte-identical, also with a freshly built pool (as after a restart)"""
+    fields = trade_fields("short")
+    seed = "3f2b8c1e-0d4a-4e57-9a51-6c1f0b7d2e90"
+
+    def render(seed):
+        return b"".join(page.getvalue() for page in image_generator.generate_trade_agreement_image(**fields, seed=seed, pages=True))
+
+    first = render(seed)
+    second = render(seed)
+
+    pools = image_generator.background_pools
+    original_pool = pools["full"]
+    pools["full"] = BackgroundPool(
+        original_pool.size, original_pool.width, original_pool.height,
+        texture=ParchmentTexture(original_pool.texture.path), **original_pool.options
+    )
+    try:
+        restarted = render(seed)
+    finally:
+        pools["full"] = original_pool
+
+    digests = sorted({hashlib.sha256(data).hexdigest() for data in (first, second, restarted)})
+    deterministic = len(digests) == 1
+    print(f"Seeded render digest: {digests[0][:16]}  deterministic: {deterministic}")
+    return {"digest": digests[0], "deterministic": deterministic}
+
+def find_regressions(results, baseline, threshold):
+    """Benchmarks whose mean time grew by more than threshold compared to the baseline report"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or not previous.get("mean_ms"):
+            continue
+        ratio = current["mean_ms"] / previous["mean_ms"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["mean_ms"], current["mean_ms"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark contract rendering")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per benchmark")
+    parser.add_argument("--skip-slow", action="store_true",
+                        help="skip the per-pixel reference implementations (several seconds each)")
+    options = parser.parse_args()
+
+    background_pool.warm_up()
+    results = {}
+    benchmark_backgrounds(results, options.repeat, not options.skip_slow)
+    benchmark_documents(results, options.repeat)
+    benchmark_encoding(results, max(1, options.repeat // 2))
+    determinism = check_determinism()
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": options.repeat,
+        },
+        "determinism": determinism,
+        "benchmarks": results,
+    }
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {options.output}")
+
+    failed = not determinism["deterministic"]
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, options.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.1f} ms -> {after:.1f} ms ({ratio:.2f}x)")
+        if not regressions:
+            print(f"No regressions beyond {options.threshold:.0%} against {options.baseline}")
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
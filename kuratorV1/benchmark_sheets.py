@@ -0,0 +1,90 @@
+"""
+Per-write latency of Google Sheets logging, before and after the shared client in utils/sheets.
+
+    python benchmark_sheets.py --setup-only
+    python benchmark_sheets.py --spreadsheet-id <id> --range 'Benchmark!A:B' --writes 20
+
+"fresh" repeats what every logged row used to do: read the credentials, build the service
+and execute with a new HTTP connection and token. "shared" appends through sheets_client,
+which reuses the service, the access token and a keep-alive connection. --setup-only skips
+the HTTP requests and compares only the per-write setup (needs no spreadsheet).
+The appended rows land in --range; use a scratch tab, not a game sheet.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+import config
+from utils.sheets import SheetsClient, build_sheets_service, load_credentials
+
+def summarize(name, timings):
+    ordered = sorted(timings)
+    result = {
+        "best_ms": round(ordered[0], 1),
+        "mean_ms": round(statistics.mean(ordered), 1),
+        "p50_ms": round(ordered[len(ordered) // 2], 1),
+        "p90_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 1),
+        "writes": len(ordered),
+    }
+    print(f"  {name:8s} best {result['best_ms']:8.1f} ms  mean {result['mean_ms']:8.1f} ms  "
+          f"p50 {result['p50_ms']:8.1f} ms  p90 {result['p90_ms']:8.1f} ms")
+    return result
+
+def time_writes(func, writes):
+    timings = []
+    for number in range(writes):
+        start = time.perf_counter()
+        func(number)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spreadsheet-id", default=config.TRADE_SHEET_ID, help="Spreadsheet to append to")
+    parser.add_argument("--range", default="Benchmark!A:B", help="Scratch range the rows are appended to")
+    parser.add_argument("--writes", type=int, default=10, help="Writes per variant")
+    parser.add_argument("--setup-only", action="store_true", help="Measure only service setup, no HTTP requests")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    options = parser.parse_args()
+
+    if load_credentials() is None:
+        sys.exit("Keine Zugangsdaten: empire-service-account.json oder GOOGLE_SERVICE_ACCOUNT setzen")
+    if not options.setup_only and not options.spreadsheet_id:
+        sys.exit("--spreadsheet-id fehlt (oder TRADE_SHEET_ID setzen), alternativ --setup-only")
+
+    client = SheetsClient(timeout=config.SHEETS_TIMEOUT)
+
+    def row(variant, number):
+        return [[datetime.now().isoformat(timespec="seconds"), f"benchmark {variant} {number}"]]
+
+    def fresh(number):
+        service = build_sheets_service(load_credentials())
+        if options.setup_only:
+            return
+        service.spreadsheets().values().append(
+            spreadsheetId=options.spreadsheet_id, range=options.range, valueInputOption="USER_ENTERED",
+            insertDataOption="INSERT_ROWS", body={"values": row("fresh", number)}
+        ).execute()
+
+    def shared(number):
+        if options.setup_only:
+            client.service()
+            return
+        client.append(options.spreadsheet_id, options.range, row("shared", number))
+
+    print("Sheets per-write latency" + (" (setup only)" if options.setup_only else ""))
+    results = {
+        "fresh": summarize("fresh", time_writes(fresh, options.writes)),
+        "shared": summarize("shared", time_writes(shared, options.writes)),
+    }
+    # The first shared write pays the one-time setup; steady state is what the bot sees afterwards
+    print(f"  speed-up (mean): {results['fresh']['mean_ms'] / max(results['shared']['mean_ms'], 0.001):.1f}x")
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({"created": datetime.now().isoformat(), "setup_only": options.setup_only, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
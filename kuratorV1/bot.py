@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 import discord
 from discord.ext import commands
 from keep_alive import keep_alive
+import config
+from utils import sheets
+from utils.renderer import renderer
 
 # Load environment variables
 load_dotenv()
@@ -39,10 +42,29 @@ def run_bot():
                 except Exception as e:
                     logger.error(f'Failed to load extension {filename}: {e}')
     
+    async def warm_up_backgrounds():
+        """Start the render workers, which pre-render their parchment pools per PARCHMENT_POOL_WARMUP."""
+        if await renderer.use_daemon():
+            # Local workers start lazily, only if the daemon goes away
+            logger.info('Rendering via the render daemon')
+            return
+        strategy = config.PARCHMENT_POOL_WARMUP
+        if strategy == 'eager':
+            # Block startup until every worker has a full pool
+            await renderer.wait_ready()
+        elif strategy == 'background':
+            bot.loop.create_task(renderer.wait_ready())
+        else:
+            renderer.start()
+            logger.info('Parchment pool fills lazily on first renders')
+    
     @bot.event
     async def setup_hook():
         """Called when the bot is starting up."""
         await load_extensions()
+        await warm_up_backgrounds()
+        # Build the shared Sheets client now instead of on the first logged row
+        bot.loop.create_task(sheets.warm_up())
     
     token = os.getenv('DISCORD_TOKEN')
     if not token:
@@ -59,6 +81,9 @@ def run_bot():
         logger.error('Invalid token. Please check your DISCORD_TOKEN environment variable.')
     except Exception as e:
         logger.error(f'An error occurred while running the bot: {e}')
+    finally:
+        renderer.shutdown()
+        sheets.shutdown()
 
 if __name__ == "__main__":
     run_bot()
\ No newline at end of file
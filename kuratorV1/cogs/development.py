@@ -173,14 +173,16 @@ class Development(commands.Cog):
             
             # Log the development to the Google Sheet
             try:
-                sheets.log_ausbau_to_sheet(
+                await sheets.log_ausbau_to_sheet_async(
                     os.environ.get('TRADE_SHEET_ID', ''),
                     land,
                     ausbau_art.value,
                     stufe,
                     kosten,
                     gebiet,
-                    anzahl
+                    anzahl,
+                    row_id=f"ausbau:{interaction.id}",
+                    wait=False  # journaled locally, written with the next batch and retried until delivered
                 )
             except Exception as e:
                 print(f"Error logging development to sheet: {e}")
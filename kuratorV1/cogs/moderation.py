@@ -1,7 +1,18 @@
+import time
+import tempfile
 import discord
 from discord import app_commands
 from discord.ext import commands
 import config
+from utils.renderer import ContractSpec, renderer, write_zip
+from utils.render_stats import render_stats
+
+# Discord upload limit for bots without boosted servers
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+def archive_name(*parts):
+    """Join user-provided parts into a file name that cannot escape its ZIP folder"""
+    return "_".join(str(part).replace("/", "-").replace("\\", "-") for part in parts)
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
@@ -152,5 +163,109 @@ class Moderation(commands.Cog):
         except discord.HTTPException as e:
             await interaction.followup.send(f"An error occurred while deleting messages: {e}", ephemeral=True)
 
+    def contract_specs(self, art, output_profile=None):
+        """Render specs for all active treaties and/or accepted trades, optionally in another output profile"""
+        specs = []
+        if art in ("treaties", "all"):
+            treaties = self.bot.get_cog("Treaties")
+            for treaty_id, treaty in (treaties.active_treaties.items() if treaties else ()):
+                name = "vertraege/" + archive_name(treaty['type'], treaty['initiator_country'], treaty['partner_country'], treaty_id[:8])
+                document = treaties.final_document_args(treaty_id, treaty)
+                specs.append(ContractSpec("treaty", name, dict(document, output_profile=output_profile or document['output_profile'])))
+        if art in ("trades", "all"):
+            trade = self.bot.get_cog("Trade")
+            for trade_id, document in (trade.completed_trades.items() if trade else ()):
+                name = "handel/" + archive_name(document['initiator_country'], document['partner_country'], trade_id[:8])
+                specs.append(ContractSpec("trade", name, dict(document, output_profile=output_profile or document['output_profile'])))
+        return specs
+
+    @app_commands.command(name="export_contracts", description="Export all active treaties and/or accepted trades as a ZIP archive")
+    @app_commands.choices(art=[
+        app_commands.Choice(name="Verträge", value="treaties"),
+        app_commands.Choice(name="Handelsverträge", value="trades"),
+        app_commands.Choice(name="Alles", value="all"),
+    ])
+    @app_commands.choices(file_format=[
+        app_commands.Choice(name="PDF (durchsuchbar, druckfertig)", value="pdf"),
+        app_commands.Choice(name="PNG (wie in Discord)", value="png"),
+    ])
+    async def export_contracts(self, interaction: discord.Interaction, art: app_commands.Choice[str],
+                               file_format: app_commands.Choice[str] = None):
+        """Render the selected contracts over the render pool and send them as a ZIP archive (PDF by default)"""
+        # Check if the user has permission
+        if not interaction.user.guild_permissions.administrator and not self.is_moderator(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        specs = self.contract_specs(art.value, file_format.value if file_format else "pdf")
+        if not specs:
+            await interaction.response.send_message("There are no contracts to export.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        status = await interaction.followup.send(f"Rendering contracts: 0/{len(specs)}", ephemeral=True, wait=True)
+        last_update = time.monotonic()
+
+        async def progress(done, total):
+            nonlocal last_update
+            # Edit at most every 2 seconds to stay clear of rate limits
+            if done < total and time.monotonic() - last_update < 2:
+                return
+            last_update = time.monotonic()
+            try:
+                await status.edit(content=f"Rendering contracts: {done}/{total}")
+            except discord.HTTPException:
+                pass
+
+        # Spool to disk so large exports don't sit in memory
+        with tempfile.TemporaryFile() as archive:
+            written, failed = await write_zip(specs, archive, progress)
+            size = archive.tell()
+            archive.seek(0)
+            summary = f"Exported {written} contracts" + (f", {failed} failed" if failed else "") + "."
+            if size > MAX_UPLOAD_BYTES:
+                await interaction.followup.send(
+                    f"{summary} The archive is {size / 1024 / 1024:.1f} MB, too large to upload.", ephemeral=True
+                )
+                return
+            await interaction.followup.send(
+                summary, file=discord.File(fp=archive, filename=f"{art.value}_export.zip"), ephemeral=True
+            )
+
+    @app_commands.command(name="render_stats", description="Show render stage timings (percentiles over recent renders)")
+    async def render_stats(self, interaction: discord.Interaction):
+        """Show the rolling render stage percentiles collected by the profiling hook"""
+        # Check if the user has permission
+        if not interaction.user.guild_permissions.administrator and not self.is_moderator(interaction.user):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        # Asking a busy daemon can take longer than Discord's 3 s response deadline
+        await interaction.response.defer(ephemeral=True)
+
+        # With a render daemon the documents are rendered (and profiled) there
+        daemon = await renderer.daemon_stats()
+        snapshot = daemon["render_stages"] if daemon else render_stats.snapshot()
+        queue_depth = daemon["queue_depth"] if daemon else renderer.queue_depth()
+        if not snapshot["enabled"]:
+            await interaction.followup.send(
+                "Render profiling is off. Set RENDER_PROFILING=timing (or memory) to collect stage timings.", ephemeral=True
+            )
+            return
+        if not snapshot["stages_ms"]:
+            await interaction.followup.send("No renders recorded yet.", ephemeral=True)
+            return
+
+        lines = [f"{'stage':<10} {'n':>5} {'p50':>8} {'p90':>8} {'p99':>8}"]
+        for name, p in sorted(snapshot["stages_ms"].items(), key=lambda item: -item[1]["p50"]):
+            lines.append(f"{name:<10} {p['count']:>5} {p['p50']:>8.1f} {p['p90']:>8.1f} {p['p99']:>8.1f}")
+        for name, p in snapshot["peak_kib"].items():
+            lines.append(f"{name + ' KiB':<14} {p['p50']:>8.0f} {p['p90']:>8.0f} {p['max']:>8.0f}")
+        embed = discord.Embed(title="Render timings (ms)", description="```\n" + "\n".join(lines) + "\n```")
+        source = "render daemon" if daemon else "in-process"
+        level = renderer.load_stats().get("level", "fixed")
+        embed.set_footer(text=f"Mode: {snapshot['mode']} · {source} · Queue depth: {queue_depth} · Quality: {level}")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
\ No newline at end of file
@@ -5,7 +5,10 @@ from discord import app_commands
 from discord.ext import commands
 import asyncio
 import datetime
-from utils.image_generator import generate_trade_agreement_image
+import config
+from utils.image_generator import output_filename
+from utils.publishing import archive_channel, document_files, publish_document
+from utils.renderer import render_trade
 from utils import sheets
 
 class TradeResources:
@@ -20,6 +23,7 @@ class Trade(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.pending_trades = {}  # Dict to store pending trade agreements
+        self.completed_trades = {}  # Render arguments of accepted trades, for the GM archive export
     
     trade_resources = [
         app_commands.Choice(name="Stein", value=TradeResources.STEIN),
@@ -108,8 +112,11 @@ class Trade(commands.Cog):
         timestamp = datetime.datetime.now().strftime("%d.%m.%Y, %H:%M Uhr")
         embed.set_footer(text=f"Trade ID: {trade_id} • {timestamp}")
         
+        # Rendering happens in a worker process and may take longer than the interaction deadline
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        
         # Create the image for the trade agreement
-        trade_image = generate_trade_agreement_image(
+        trade_image = await render_trade(
             interaction.user.display_name, 
             partner.display_name,
             land,
@@ -120,7 +127,10 @@ class Trade(commands.Cog):
             nachfrage_menge,
             timestamp,
             vertragsbruch_klausel,
-            anmerkungen
+            anmerkungen,
+            output_profile=config.RENDER_PROFILE_PREVIEW,
+            quality="preview",
+            seed=trade_id
         )
         
         # Store the trade data
@@ -134,13 +144,15 @@ class Trade(commands.Cog):
             "request_resource": nachfrage_ressource.value,
             "request_amount": nachfrage_menge,
             "embed": embed,
-            "timestamp": timestamp
+            "timestamp": timestamp,
+            "vertragsbruch_klausel": vertragsbruch_klausel,
+            "anmerkungen": anmerkungen
         }
         
         # Send a confirmation message to the user
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"Handelsangebot an {partner.mention} gesendet. Warte auf deren Bestätigung.",
-            file=discord.File(fp=trade_image, filename="handelsvertrag.png"),
+            files=document_files(trade_image, output_filename("handelsvertrag", config.RENDER_PROFILE_PREVIEW)),
             ephemeral=True
         )
         
@@ -162,7 +174,7 @@ class Trade(commands.Cog):
         try:
             # Create the image for the trade agreement
             trade_data = self.pending_trades[trade_id]
-            trade_image = generate_trade_agreement_image(
+            trade_image = await render_trade(
                 initiator.display_name, 
                 partner.display_name,
                 trade_data["initiator_country"],
@@ -171,14 +183,19 @@ class Trade(commands.Cog):
                 trade_data["offer_amount"],
                 trade_data["request_resource"],
                 trade_data["request_amount"],
-                trade_data["timestamp"]
+                trade_data["timestamp"],
+                trade_data["vertragsbruch_klausel"],
+                trade_data["anmerkungen"],
+                output_profile=config.RENDER_PROFILE_PREVIEW,
+                quality="preview",
+                seed=trade_id
             )
             
             # DM the partner
             dm_message = await partner.send(
                 f"{initiator.mention} hat dir einen Handelsvertrag angeboten. Akzeptiere mit `ja` oder lehne mit `nein [Grund]` ab:",
                 embed=embed,
-                file=discord.File(fp=trade_image, filename="handelsvertrag.png")
+                files=document_files(trade_image, output_filename("handelsvertrag", config.RENDER_PROFILE_PREVIEW))
             )
             
             # Wait for a response from the partner
@@ -239,16 +256,18 @@ class Trade(commands.Cog):
         # Send a message to the initiator
         try:
             if accepted:
-                # Log the trade to the Google Sheet if accepted
+                # Queue the trade for the Google Sheet if accepted
                 try:
-                    sheets.log_trade_to_sheet(
+                    await sheets.log_trade_to_sheet_async(
                         os.environ.get('TRADE_SHEET_ID', ''),
                         trade_data["initiator_country"],
                         trade_data["partner_country"],
                         trade_data["offer_resource"],
                         trade_data["offer_amount"],
                         trade_data["request_resource"],
-                        trade_data["request_amount"]
+                        trade_data["request_amount"],
+                        row_id=f"trade:{trade_id}",
+                        wait=False  # journaled locally, written with the next batch and retried until delivered
                     )
                 except Exception as e:
                     print(f"Error logging trade to sheet: {e}")
@@ -256,21 +275,18 @@ class Trade(commands.Cog):
                 await initiator.send(f"{partner.mention} hat deinen Handelsvertrag akzeptiert!")
                 
                 # Create a final version of the trade agreement image
-                trade_image = generate_trade_agreement_image(
-                    initiator.display_name, 
-                    partner.display_name,
-                    trade_data["initiator_country"],
-                    trade_data["partner_country"],
-                    trade_data["offer_resource"],
-                    trade_data["offer_amount"],
-                    trade_data["request_resource"],
-                    trade_data["request_amount"],
-                    trade_data["timestamp"]
-                )
+                document = self.final_document_args(trade_id, trade_data)
+                self.completed_trades[trade_id] = document
+                trade_image = await render_trade(**document)
                 
-                # Send the final image to both parties
-                await initiator.send(file=discord.File(fp=trade_image, filename="handelsvertrag_final.png"))
-                await partner.send(file=discord.File(fp=trade_image, filename="handelsvertrag_final.png"))
+                # Send the final image to the archive and both parties (rendered once)
+                await publish_document(
+                    trade_image,
+                    output_filename("handelsvertrag_final", config.RENDER_PROFILE_FINAL),
+                    [(initiator, None), (partner, None)],
+                    archive=archive_channel(self.bot, config.DOCUMENT_ARCHIVE_CHANNEL_ID),
+                    archive_content=f"Handelsvertrag zwischen {trade_data['initiator_country']} und {trade_data['partner_country']} ({trade_id})"
+                )
                 
             else:
                 reason_msg = f" Grund: {rejection_reason}" if rejection_reason else ""
@@ -286,5 +302,23 @@ class Trade(commands.Cog):
         if trade_id in self.pending_trades:
             del self.pending_trades[trade_id]
 
+    def final_document_args(self, trade_id, trade_data):
+        """Arguments for the final trade agreement image, also used to re-render it for exports"""
+        return {
+            "initiator_name": trade_data["initiator"].display_name,
+            "partner_name": trade_data["partner"].display_name,
+            "initiator_country": trade_data["initiator_country"],
+            "partner_country": trade_data["partner_country"],
+            "offer_resource": trade_data["offer_resource"],
+            "offer_amount": trade_data["offer_amount"],
+            "request_resource": trade_data["request_resource"],
+            "request_amount": trade_data["request_amount"],
+            "timestamp": trade_data["timestamp"],
+            "vertragsbruch_klausel": trade_data["vertragsbruch_klausel"],
+            "anmerkungen": trade_data["anmerkungen"],
+            "output_profile": config.RENDER_PROFILE_FINAL,
+            "seed": trade_id,
+        }
+
 async def setup(bot):
     await bot.add_cog(Trade(bot))
\ No newline at end of file
@@ -7,7 +7,9 @@ import asyncio
 import datetime
 from discord.ext import tasks
 import config
-from utils.image_generator import generate_treaty_image
+from utils.image_generator import output_filename
+from utils.publishing import archive_channel, document_files, publish_document
+from utils.renderer import render_treaty
 
 class TreatyTypes:
     NON_AGGRESSION = "Nichtangriffspakt"
@@ -153,7 +155,7 @@ class Treaties(commands.Cog):
             embed.set_footer(text=f"Treaty ID: {treaty_id} • {timestamp}")
             
             # Create the image for the treaty
-            treaty_image = generate_treaty_image(
+            treaty_image = await render_treaty(
                 interaction.user.display_name, 
                 partner.display_name,
                 initiator_country,
@@ -161,7 +163,10 @@ class Treaties(commands.Cog):
                 vertragstyp.value,
                 f"{laufzeit} Tage (bis {expiry_str})",
                 vertragsbruch_klausel,
-                anmerkungen
+                anmerkungen,
+                output_profile=config.RENDER_PROFILE_PREVIEW,
+                quality="preview",
+                seed=treaty_id
             )
             
             # Store the treaty data
@@ -182,7 +187,7 @@ class Treaties(commands.Cog):
             # Send a confirmation message to the user
             await interaction.followup.send(
                 f"Vertragsangebot an {partner.mention} gesendet. Warte auf deren Bestätigung.",
-                file=discord.File(fp=treaty_image, filename="vertrag.png"),
+                files=document_files(treaty_image, output_filename("vertrag", config.RENDER_PROFILE_PREVIEW)),
                 ephemeral=True
             )
             
@@ -258,7 +263,7 @@ class Treaties(commands.Cog):
         try:
             # Create the image for the treaty
             treaty_data = self.pending_treaties[treaty_id]
-            treaty_image = generate_treaty_image(
+            treaty_image = await render_treaty(
                 initiator.display_name, 
                 partner.display_name,
                 treaty_data["initiator_country"],
@@ -266,14 +271,17 @@ class Treaties(commands.Cog):
                 treaty_data["type"],
                 f"{treaty_data['duration']} Tage (bis {treaty_data['expiry_date'].strftime('%d.%m.%Y')})",
                 treaty_data["vertragsbruch_klausel"],
-                treaty_data["anmerkungen"]
+                treaty_data["anmerkungen"],
+                output_profile=config.RENDER_PROFILE_PREVIEW,
+                quality="preview",
+                seed=treaty_id
             )
             
             # DM the partner
             dm_message = await partner.send(
                 f"{initiator.mention} hat dir einen {treaty_data['type']} angeboten. Akzeptiere mit `ja` oder lehne mit `nein [Grund]` ab:",
                 embed=embed,
-                file=discord.File(fp=treaty_image, filename="vertrag.png")
+                files=document_files(treaty_image, output_filename("vertrag", config.RENDER_PROFILE_PREVIEW))
             )
             
             # Wait for a response from the partner
@@ -335,25 +343,22 @@ class Treaties(commands.Cog):
         try:
             if accepted:
                 # Move the treaty from pending to active
+                treaty_data["signing_date"] = datetime.datetime.now().strftime("%d.%m.%Y")
                 self.active_treaties[treaty_id] = treaty_data
                 
                 await initiator.send(f"{partner.mention} hat deinen Vertrag ({treaty_data['type']}) akzeptiert!")
                 
                 # Create a final version of the treaty image
-                treaty_image = generate_treaty_image(
-                    initiator.display_name, 
-                    partner.display_name,
-                    treaty_data["initiator_country"],
-                    treaty_data["partner_country"],
-                    treaty_data["type"],
-                    f"{treaty_data['duration']} Tage (bis {treaty_data['expiry_date'].strftime('%d.%m.%Y')})",
-                    treaty_data["vertragsbruch_klausel"],
-                    treaty_data["anmerkungen"]
-                )
+                treaty_image = await render_treaty(**self.final_document_args(treaty_id, treaty_data))
                 
-                # Send the final image to both parties
-                await initiator.send(file=discord.File(fp=treaty_image, filename="vertrag_final.png"))
-                await partner.send(file=discord.File(fp=treaty_image, filename="vertrag_final.png"))
+                # Send the final image to the archive and both parties (rendered once)
+                await publish_document(
+                    treaty_image,
+                    output_filename("vertrag_final", config.RENDER_PROFILE_FINAL),
+                    [(initiator, None), (partner, None)],
+                    archive=archive_channel(self.bot, config.DOCUMENT_ARCHIVE_CHANNEL_ID),
+                    archive_content=f"{treaty_data['type']} zwischen {treaty_data['initiator_country']} und {treaty_data['partner_country']} ({treaty_id})"
+                )
                 
             else:
                 reason_msg = f" Grund: {rejection_reason}" if rejection_reason else ""
@@ -369,6 +374,22 @@ class Treaties(commands.Cog):
         if treaty_id in self.pending_treaties:
             del self.pending_treaties[treaty_id]
     
+    def final_document_args(self, treaty_id, treaty_data):
+        """Arguments for the final treaty image, also used to re-render it for exports"""
+        return {
+            "initiator_name": treaty_data["initiator"].display_name,
+            "partner_name": treaty_data["partner"].display_name,
+            "initiator_country": treaty_data["initiator_country"],
+            "partner_country": treaty_data["partner_country"],
+            "treaty_type": treaty_data["type"],
+            "expiry_date": f"{treaty_data['duration']} Tage (bis {treaty_data['expiry_date'].strftime('%d.%m.%Y')})",
+            "vertragsbruch_klausel": treaty_data["vertragsbruch_klausel"],
+            "anmerkungen": treaty_data["anmerkungen"],
+            "signing_date": treaty_data.get("signing_date"),
+            "output_profile": config.RENDER_PROFILE_FINAL,
+            "seed": treaty_id,
+        }
+
     @tasks.loop(hours=24)
     async def check_expired_treaties(self):
         """Überprüft regelmäßig abgelaufene Verträge und benachrichtigt die Parteien"""
@@ -10,6 +10,12 @@ DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 # Google Sheets Configuration
 TRADE_SHEET_ID = os.getenv('TRADE_SHEET_ID')
 GOOGLE_SERVICE_ACCOUNT = os.getenv('GOOGLE_SERVICE_ACCOUNT')
+SHEETS_WORKERS = int(os.getenv('SHEETS_WORKERS', 4))  # Threads for the blocking Google client
+SHEETS_TIMEOUT = float(os.getenv('SHEETS_TIMEOUT', 30))  # Seconds a command waits for a Sheets write
+SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', 5))  # Seconds ledger rows are collected before one batched append
+SHEETS_BATCH_ROWS = int(os.getenv('SHEETS_BATCH_ROWS', 50))  # Waiting rows per range that trigger an early flush
+SHEETS_OUTBOX = os.getenv('SHEETS_OUTBOX', 'sheets_outbox.db')  # SQLite journal of ledger rows until Google has them (relative to the project directory), empty to disable
+SHEETS_REPLAY_INTERVAL = float(os.getenv('SHEETS_REPLAY_INTERVAL', 60))  # Seconds between retries of undelivered rows
 
 # Default command prefix
 PREFIX = '!'
@@ -51,4 +57,36 @@ DEVELOPMENT_TYPES = [
 ]
 
 # Roles that can use mod commands
-MOD_ROLES = ["Admin", "Moderator", "Game Master"]
\ No newline at end of file
+MOD_ROLES = ["Admin", "Moderator", "Game Master"]
+
+# Parchment background pool (see utils/image_generator.py)
+PARCHMENT_POOL_SIZE = int(os.getenv('PARCHMENT_POOL_SIZE', 8))  # Pre-rendered variants per render worker, ~3.7 MB each (800x1600)
+PARCHMENT_POOL_WARMUP = os.getenv('PARCHMENT_POOL_WARMUP', 'background')  # eager, background or lazy
+PARCHMENT_TILE = os.getenv('PARCHMENT_TILE', os.path.join('assets', 'textures', 'parchment_tile.png'))  # Custom seamless tile, synthesized if missing
+
+# Contract render workers (see utils/renderer.py)
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', max(1, (os.cpu_count() or 2) - 1)))  # Leave one core for the gateway
+RENDER_QUEUE_SIZE = int(os.getenv('RENDER_QUEUE_SIZE', 32))  # Renders in flight before callers have to wait
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # Encoded images kept for repeat requests
+RENDER_PROFILING = os.getenv('RENDER_PROFILING', 'off')  # off, timing or memory (tracemalloc, noticeably slower)
+RENDER_STATS_WINDOW = int(os.getenv('RENDER_STATS_WINDOW', 500))  # Renders the stage percentiles are computed over
+
+# Shared render daemon (python -m utils.render_daemon), used by all bot processes on this host
+RENDER_DAEMON_SOCKET = os.getenv('RENDER_DAEMON_SOCKET', '')  # Unix socket path, empty renders in-process
+RENDER_DAEMON_BACKLOG = int(os.getenv('RENDER_DAEMON_BACKLOG', 128))  # Queued renders before the daemon answers busy
+RENDER_DAEMON_TIMEOUT = float(os.getenv('RENDER_DAEMON_TIMEOUT', 60))  # Seconds before a bot renders in-process instead
+
+# Adaptive quality: under load full-size documents step down to faster encoding, then to preview resolution
+RENDER_ADAPTIVE_QUALITY = os.getenv('RENDER_ADAPTIVE_QUALITY', 'on') == 'on'  # off always renders at the requested quality
+RENDER_REDUCED_QUEUE = int(os.getenv('RENDER_REDUCED_QUEUE', 8))  # Queued renders that switch to fast PNG encoding
+RENDER_REDUCED_LATENCY_MS = int(os.getenv('RENDER_REDUCED_LATENCY_MS', 2000))  # ... or average render latency that does
+RENDER_PREVIEW_QUEUE = int(os.getenv('RENDER_PREVIEW_QUEUE', 24))  # Queued renders that switch to preview resolution
+RENDER_PREVIEW_LATENCY_MS = int(os.getenv('RENDER_PREVIEW_LATENCY_MS', 6000))  # ... or average render latency that does
+RENDER_ADAPTIVE_COOLDOWN = float(os.getenv('RENDER_ADAPTIVE_COOLDOWN', 30))  # Seconds of lower load before stepping back up
+
+# Output profiles for contract images (see OUTPUT_PROFILES in utils/image_generator.py)
+RENDER_PROFILE_PREVIEW = os.getenv('RENDER_PROFILE_PREVIEW', 'png_fast')  # Half-resolution previews of pending offers
+RENDER_PROFILE_FINAL = os.getenv('RENDER_PROFILE_FINAL', 'png')  # Ratified documents (png_optimized is ~10x slower to encode)
+
+# Ratified documents are also posted to this channel as a record (0 = only the parties get them)
+DOCUMENT_ARCHIVE_CHANNEL_ID = int(os.getenv('DOCUMENT_ARCHIVE_CHANNEL_ID', 0))
@@ -1,7 +1,10 @@
 import os
 import logging
 from threading import Thread
-from flask import Flask, render_template
+from flask import Flask, jsonify, render_template
+from utils.renderer import render_cache, renderer
+from utils.render_stats import render_stats
+from utils.sheets import write_queue
 
 # Set up logging
 logging.basicConfig(
@@ -21,6 +24,16 @@ def home():
 def health():
     return "Bot is alive!"
 
+@app.route('/metrics')
+def metrics():
+    """Expose render statistics as JSON"""
+    return jsonify({
+        "render_cache": render_cache.stats(),
+        "render_load": renderer.load_stats(),
+        "render_stages": render_stats.snapshot(),
+        "sheets": write_queue.stats(),
+    })
+
 def run_flask():
     """Run the Flask application on a specific port"""
     app.run(host='0.0.0.0', port=5000)
@@ -11,6 +11,7 @@ def print_requirements():
         "google-auth-httplib2==0.2.0",
         "google-auth-oauthlib==1.2.1",
         "gunicorn==23.0.0",
+        "numpy==2.2.4",
         "pillow==11.1.0",
         "psycopg2-binary==2.9.10",
         "python-dotenv==1.1.0",
@@ -0,0 +1,141 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from PIL import ImageFont
+from utils import render_stats
+
+logger = logging.getLogger('discord_bot')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FONT_PATHS = {
+    'garamond': os.path.join(BASE_DIR, 'assets', 'fonts', 'garamond.ttf'),
+    'times_new_roman': os.path.join(BASE_DIR, 'assets', 'fonts', 'times_new_roman.ttf'),
+}
+FALLBACK_FONT = "DejaVuSerif.ttf"
+
+# Zeichen, die in Verträgen vorkommen und jede Schrift darstellen können sollte
+REQUIRED_GLYPHS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    "ÄÖÜäöüß.,:;!?()-–„“\"'§€%&/"
+)
+
+class FontRegistry:
+    """
+    Lädt jede Kombination aus Schrift und Größe genau einmal und merkt sich Textbreiten,
+    damit Zentrierung und Zeilenumbruch keine wiederholten FreeType-Aufrufe kosten.
+    """
+
+    def __init__(self, paths, measure_cache_size=8192):
+        self.paths = paths
+        self.measure_cache_size = measure_cache_size
+        self._fonts = {}
+        self._sources = {}
+        self._broken = set()
+        self._widths = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, name, size):
+        path = self.paths.get(name.lower())
+        if path and path not in self._broken and os.path.exists(path):
+            try:
+                return ImageFont.truetype(path, size), path
+            except OSError as e:
+                # Defekte Dateien nur einmal melden und danach direkt überspringen
+                self._broken.add(path)
+                logger.warning(f"Schrift {path} konnte nicht geladen werden: {e}")
+        try:
+            return ImageFont.truetype(FALLBACK_FONT, size), FALLBACK_FONT
+        except OSError:
+            return ImageFont.load_default(size), "Pillow default"
+
+    def get(self, name, size):
+        """Return the loaded font for (name, size), loading it on first use"""
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            with self._lock:
+                font = self._fonts.get(key)
+                if font is None:
+                    with render_stats.stage("font_load"):
+                        font, source = self._load(name, size)
+                    self._fonts[key] = font
+                    self._sources[key] = source
+        return font
+
+    def preload(self, name, sizes):
+        """Load all sizes of a face up front and report glyphs it cannot render"""
+        for size in sizes:
+            self.get(name, size)
+        size = max(sizes)
+        missing = self.missing_glyphs(name, size, REQUIRED_GLYPHS)
+        source = self._sources[(name, size)]
+        if missing:
+            logger.warning(f"Schrift '{name}' ({source}) hat keine Glyphen für: {''.join(sorted(missing))}")
+        else:
+            logger.info(f"Schrift '{name}' geladen aus {source}, Größen {sorted(sizes)}")
+
+    def missing_glyphs(self, name, size, text):
+        """Return the characters of text that the font renders as its .notdef box"""
+        font = self.get(name, size)
+        try:
+            notdef = font.getmask('\uffff')
+        except (UnicodeEncodeError, OSError):
+            return set()
+        notdef_bytes = (notdef.size, bytes(notdef))
+        missing = set()
+        for char in set(text):
+            if char.isspace():
+                continue
+            mask = font.getmask(char)
+            if (mask.size, bytes(mask)) == notdef_bytes:
+                missing.add(char)
+        return missing
+
+    def measure(self, text, size, name='garamond', cache=True):
+        """Pixel width of text, memoized in an LRU unless cache is False (one-off strings)"""
+        key = (name, size, text)
+        with self._lock:
+            width = self._widths.get(key)
+            if width is not None:
+                self._widths.move_to_end(key)
+                return width
+        width = self.get(name, size).getlength(text)
+        if cache:
+            with self._lock:
+                self._widths[key] = width
+                if len(self._widths) > self.measure_cache_size:
+                    self._widths.popitem(last=False)
+        return width
+
+    def wrap(self, text, size, max_width, name='garamond'):
+        """
+        Break text into lines no wider than max_width pixels.
+        Existing line breaks are kept; words wider than a line are split by characters.
+        Only whole words are cached; the growing line prefixes would push static labels out.
+        """
+        lines = []
+        for paragraph in str(text).split('\n'):
+            line = ""
+            for word in paragraph.split():
+                candidate = f"{line} {word}" if line else word
+                if self.measure(candidate, size, name, cache=False) <= max_width:
+                    line = candidate
+                    continue
+                if line:
+                    lines.append(line)
+                if self.measure(word, size, name) <= max_width:
+                    line = word
+                    continue
+                # Überlange Wörter zeichenweise umbrechen
+                line = ""
+                for char in word:
+                    if line and self.measure(line + char, size, name, cache=False) > max_width:
+                        lines.append(line)
+                        line = ""
+                    line += char
+            lines.append(line)
+        return lines
+
+font_registry = FontRegistry(FONT_PATHS)
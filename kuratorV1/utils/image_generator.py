@@ -1,327 +1,605 @@
 import io
 import os
+import math
+import functools
+import hashlib
 import random
-import textwrap
+import logging
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+from PIL.PngImagePlugin import PngInfo
+import config
+from utils import render_stats, vector_output
+from utils.fonts import font_registry
+from utils.layout import TRADE_TEMPLATE, compile_template, treaty_template
 
-# Load or create font objects
+logger = logging.getLogger('discord_bot')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Schriftarten kommen aus der gemeinsamen Registry (einmal geladen, Breiten gecacht)
 def get_font(font_name, size):
-    font_paths = {
-        'garamond': 'assets/fonts/garamond.ttf',
-        'times_new_roman': 'assets/fonts/times_new_roman.ttf'
-    }
-    
-    # Check if font exists or use default system font
-    font_path = font_paths.get(font_name.lower())
-    
-    try:
-        if font_path and os.path.exists(font_path):
-            return ImageFont.truetype(font_path, size)
-        else:
-            # Fallback to default font
+    return font_registry.get(font_name, size)
+
+def _edge_darkening(width, height, band=150):
+    """Return the edge darkening of the parchment as a (height, width) int array"""
+    xs = np.arange(width)
+    ys = np.arange(height)
+    dist_x = np.minimum(xs, width - xs)
+    dist_y = np.minimum(ys, height - ys)
+    # Distance to the nearest edge for every pixel
+    dist = np.minimum(dist_y[:, None], dist_x[None, :])
+    # int() truncation and max(0, ...) as in the per-pixel version
+    return np.maximum(0, (30 * (1 - dist / band)).astype(np.int16))
+
+def seed_from_id(contract_id):
+    """Derive a stable integer seed from a trade or treaty ID (or any string/int)"""
+    if contract_id is None or isinstance(contract_id, int):
+        return contract_id
+    digest = hashlib.sha256(str(contract_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def synthesize_parchment_tile(size=256, seed=0):
+    """
+    Seamless parchment tile: the noise grid of the per-pixel background (every 4th pixel)
+    without edges or stains, blurred with wrap-around so opposite borders match.
+    """
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((size, size, 3), dtype=np.int16)
+    pixels[:] = (240, 230, 200)
+    noise = rng.integers(-10, 11, size=pixels[::4, ::4].shape[:2], dtype=np.int16)
+    pixels[::4, ::4] += noise[:, :, None]
+    np.clip(pixels, 0, 255, out=pixels)
+
+    # Blur a 3x3 mosaic and keep the centre, so the blur wraps around the tile borders
+    mosaic = Image.fromarray(np.tile(pixels.astype(np.uint8), (3, 3, 1)), 'RGB')
+    mosaic = mosaic.filter(ImageFilter.GaussianBlur(radius=1))
+    return mosaic.crop((size, size, 2 * size, 2 * size))
+
+@functools.lru_cache(maxsize=None)
+def _stain_mask(radius):
+    """Coverage of a stain disc with a one-pixel soft edge, as a (2r+1, 2r+1, 1) array"""
+    offsets = np.arange(-radius, radius + 1)
+    distance = np.sqrt(offsets[:, None] ** 2 + offsets[None, :] ** 2)
+    mask = np.clip(radius - distance, 0, 1).astype(np.float32)[:, :, None]
+    mask.flags.writeable = False
+    return mask
+
+class ParchmentTexture:
+    """
+    Pergament aus einer nahtlosen Kachel: die Kachel wird einmal erzeugt (oder als Bild unter
+    assets/ geladen), auf jede Seitengröße gekachelt und mit einer pro Größe gecachten
+    Randabdunklung multipliziert. Flecken kommen pro Dokument aus dem Seed dazu.
+    """
+
+    def __init__(self, path=None, tile_size=256):
+        self.path = path
+        self.tile_size = tile_size
+        self.source = None
+        self._tiles = {}
+        self._vignettes = {}
+        self._lock = threading.Lock()
+
+    def _load_tile(self):
+        if self.path and os.path.exists(self.path):
             try:
-                return ImageFont.truetype("DejaVuSerif.ttf", size)
-            except IOError:
-                return ImageFont.load_default()
-    except Exception as e:
-        print(f"Error loading font: {e}")
-        return ImageFont.load_default()
-
-def generate_parchment_background(width=800, height=1100):
-    """Generate a parchment-like background texture similar to the provided template"""
-    # Create a base image with a light tan color
-    base_color = (240, 230, 200)
-    img = Image.new('RGB', (width, height), base_color)
+                with Image.open(self.path) as tile:
+                    self.source = self.path
+                    return tile.convert('RGB')
+            except OSError as e:
+                logger.warning(f"Pergament-Kachel {self.path} konnte nicht geladen werden: {e}")
+        self.source = "synthesized"
+        return synthesize_parchment_tile(self.tile_size)
+
+    def tile(self, scale=1.0):
+        """The tile as a float32 array, scaled for lower render tiers; built once per scale"""
+        tile = self._tiles.get(scale)
+        if tile is None:
+            img = self._tiles.get(1.0)
+            img = self._load_tile() if img is None else Image.fromarray(img.astype(np.uint8), 'RGB')
+            if scale != 1.0:
+                img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+            with self._lock:
+                tile = self._tiles.setdefault(scale, np.asarray(img, dtype=np.float32))
+        return tile
+
+    def vignette(self, width, height, scale=1.0):
+        """
+        Multiplicative edge darkening for one page size, shape (height, width, 1).
+        Only the tallest vignette per width is kept; shorter pages get its top and bottom rows.
+        """
+        key = (width, scale)
+        full = self._vignettes.get(key)
+        if full is None or full.shape[0] < height:
+            darkening = _edge_darkening(width, height, band=max(1, round(150 * scale)))
+            # The procedural version darkens only every 4th pixel before blurring, so the
+            # visible darkening is a fraction of the nominal 30 levels
+            full = (1 - darkening / 960).astype(np.float32)[:, :, None]
+            with self._lock:
+                current = self._vignettes.get(key)
+                if current is None or current.shape[0] < height:
+                    self._vignettes[key] = full
+                else:
+                    full = current
+        total = full.shape[0]
+        if total == height:
+            return full
+        # A row only depends on its distance to the nearer edge: the upper half matches the
+        # top rows of the tall vignette, the lower half its bottom rows
+        top = height // 2 + 1
+        return np.concatenate((full[:top], full[total - height + top:]))
+
+    def surface(self, width, height, seed=None, scale=1.0, stains=40, stain_radius=(5, 50)):
+        """Tiled and stained parchment without the edge darkening, as a float32 (height, width, 3) array"""
+        rng = np.random.default_rng(seed)
+        tile = self.tile(scale)
+        tile_h, tile_w = tile.shape[:2]
+
+        # Tile from a seeded offset so documents don't all start at the same corner of the tile
+        off_y = int(rng.integers(0, tile_h))
+        off_x = int(rng.integers(0, tile_w))
+        reps = (-(-(height + off_y) // tile_h), -(-(width + off_x) // tile_w), 1)
+        pixels = np.tile(tile, reps)[off_y:off_y + height, off_x:off_x + width]
+
+        min_radius, max_radius = stain_radius
+        for _ in range(stains):
+            x = int(rng.integers(0, width + 1))
+            y = int(rng.integers(0, height + 1))
+            radius = int(rng.integers(min_radius, max_radius + 1))
+            color = np.array((200 - int(rng.integers(0, 31)), 190 - int(rng.integers(0, 41)), 160 - int(rng.integers(0, 41))), dtype=np.float32)
+
+            y0, y1 = max(0, y - radius), min(height, y + radius + 1)
+            x0, x1 = max(0, x - radius), min(width, x + radius + 1)
+            if y0 >= y1 or x0 >= x1:
+                continue
+            mask = _stain_mask(radius)[y0 - y + radius:y1 - y + radius, x0 - x + radius:x1 - x + radius]
+            region = pixels[y0:y1, x0:x1]
+            region += (color - region) * mask
+        return pixels
+
+    def finish(self, pixels, scale=1.0):
+        """Apply the edge darkening for the size of pixels and return the image"""
+        height, width = pixels.shape[:2]
+        return Image.fromarray((pixels * self.vignette(width, height, scale)).astype(np.uint8), 'RGB')
+
+    def render(self, width, height, seed=None, scale=1.0, **options):
+        """Return a parchment background of the given size; the same seed yields the same pixels"""
+        return self.finish(self.surface(width, height, seed, scale, **options), scale)
+
+def _tile_path():
+    path = config.PARCHMENT_TILE
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+parchment_texture = ParchmentTexture(_tile_path())
+
+def generate_parchment_background(width=800, height=1100, seed=None):
+    """
+    Generate a parchment background of the given size from the shared tiled texture.
+    The same seed always yields the same pixels; without a seed the texture is random.
+    """
+    return parchment_texture.render(width, height, seed=seed)
+
+class BackgroundPool:
+    """
+    Hält eine Anzahl vorgerenderter Pergament-Flächen in maximaler Seitenhöhe bereit.
+    Renderer erhalten einen Ausschnitt in der benötigten Höhe mit passender Randabdunklung
+    statt eines neuen Hintergrunds.
+    Variante i wird immer mit Seed i erzeugt, damit alle Prozesse dieselben Varianten haben.
+    """
+
+    def __init__(self, size=8, width=800, height=1600, texture=None, **options):
+        self.size = max(1, size)
+        self.width = width
+        self.height = height
+        self.texture = texture or parchment_texture
+        # Weitere Argumente für ParchmentTexture.render (scale, stains, stain_radius)
+        self.options = options
+        self._variants = [None] * self.size
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Render variants until the pool is full and log the time and memory used"""
+        start = time.perf_counter()
+        for index in range(self.size):
+            self._variant(index)
+        self.texture.vignette(self.width, self.height, self.options.get('scale', 1.0))
+        stats = self.stats()
+        logger.info(
+            f"Parchment pool ready: {stats['variants']} variants, "
+            f"{stats['memory_bytes'] / 1024 / 1024:.1f} MB, {time.perf_counter() - start:.2f}s "
+            f"(tile: {self.texture.source})"
+        )
+
+    def get(self, seed=None, height=None, width=None):
+        """
+        Return a background of the given height (default: the pool height), cut from the
+        variant picked by seed or a random one.
+        Missing variants are rendered on demand (lazy or unfinished warm-up); pages taller or
+        wider than the pool are tiled from the texture directly.
+        """
+        index = random.randrange(self.size) if seed is None else seed % self.size
+        height = height or self.height
+        width = width or self.width
+        scale = self.options.get('scale', 1.0)
+        if width != self.width or height > self.height:
+            return self.texture.render(width, height, seed=index, **self.options)
+        return self.texture.finish(self._variant(index)[:height], scale)
+
+    def _variant(self, index):
+        img = self._variants[index]
+        if img is None:
+            with render_stats.stage("parchment"):
+                img = self.texture.surface(self.width, self.height, seed=index, **self.options).astype(np.uint8)
+            with self._lock:
+                if self._variants[index] is None:
+                    self._variants[index] = img
+                img = self._variants[index]
+        return img
+
+    def stats(self):
+        """Return size and memory footprint of the pool"""
+        with self._lock:
+            variants = sum(1 for img in self._variants if img is not None)
+        return {
+            "variants": variants,
+            "capacity": self.size,
+            "width": self.width,
+            "height": self.height,
+            "memory_bytes": variants * self.width * self.height * 3,
+        }
+
+@dataclass(frozen=True)
+class RenderTier:
+    """Qualitätsstufe: Maßstab gegenüber der Vorlage, Pergament-Flecken und Standard-Kodierung"""
+    scale: float
+    stains: int
+    stain_radius: tuple
+    output_profile: str
+
+RENDER_TIERS = {
+    # Verbindliches Dokument in voller Auflösung
+    "full": RenderTier(1.0, 40, (5, 50), "png"),
+    # Angebote werden oft abgelehnt oder laufen ab: halbe Auflösung, weniger Flecken, schnelle Kodierung
+    "preview": RenderTier(0.5, 12, (3, 25), "png_fast"),
+}
+
+def _tier_pool(tier):
+    return BackgroundPool(
+        config.PARCHMENT_POOL_SIZE,
+        round(TRADE_TEMPLATE.width * tier.scale), round(TRADE_TEMPLATE.max_height * tier.scale),
+        scale=tier.scale, stains=tier.stains, stain_radius=tier.stain_radius
+    )
+
+background_pools = {name: _tier_pool(tier) for name, tier in RENDER_TIERS.items()}
+background_pool = background_pools["full"]
+preview_pool = background_pools["preview"]
+
+# Heraldische Tinkturen: Farben und Metalle (Metall nie auf Metall, Farbe nie auf Farbe)
+HERALDIC_COLOURS = [(170, 25, 35), (25, 60, 140), (20, 110, 55), (30, 30, 30), (105, 40, 110)]
+HERALDIC_METALS = [(225, 185, 60), (225, 225, 215)]
+SEAL_WAX = [(140, 25, 25), (110, 20, 35), (45, 70, 40), (40, 45, 80), (95, 60, 30), (55, 35, 30)]
+SEAL_DIVISIONS = ("plain", "per_pale", "per_fess", "quarterly", "per_bend")
+SEAL_CHARGES = ("star", "cross", "roundel", "chevron", "lozenge")
+# Bei Änderungen an der Siegelgrafik erhöhen, damit alte Dateien unter assets/ nicht mehr passen
+SEAL_VERSION = 1
+
+def _shade(color, factor):
+    return tuple(max(0, min(255, int(c * factor))) for c in color)
+
+def _star(cx, cy, radius, points=5):
+    coords = []
+    for i in range(points * 2):
+        angle = math.pi * i / points - math.pi / 2
+        r = radius if i % 2 == 0 else radius * 0.42
+        coords.append((cx + r * math.cos(angle), cy + r * math.sin(angle)))
+    return coords
+
+def generate_seal(country, size=256):
+    """
+    Zeichnet ein Wachssiegel mit Wappen für ein Land als RGBA-Bild.
+    Farben, Teilung, Wappenfigur und Randverzierung folgen aus einem Hash des Landesnamens.
+    """
+    rng = random.Random(hashlib.sha256(country.strip().lower().encode('utf-8')).digest())
+    wax = rng.choice(SEAL_WAX)
+    colour = rng.choice(HERALDIC_COLOURS)
+    metal = rng.choice(HERALDIC_METALS)
+    field, second = (colour, metal) if rng.random() < 0.5 else (metal, colour)
+    division = rng.choice(SEAL_DIVISIONS)
+    charge = rng.choice(SEAL_CHARGES)
+    beads = rng.choice((16, 20, 24, 28))
+
+    # Supersampling: doppelt so groß zeichnen und verkleinern, damit Kanten glatt werden
+    ss = size * 2
+    c = ss / 2
+    img = Image.new('RGBA', (ss, ss), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
-    # Add noise and texture to the parchment
-    for y in range(height):
-        for x in range(width):
-            # Random noise
-            noise = random.randint(-10, 10)
-            # Darker edges
-            edge_darken = max(0, int(30 * (1 - min(x, width-x, y, height-y) / 150)))
-            # Get current pixel color
-            r, g, b = base_color
-            # Apply effects
-            r = max(0, min(255, r + noise - edge_darken))
-            g = max(0, min(255, g + noise - edge_darken))
-            b = max(0, min(255, b + noise - edge_darken))
-            # Set pixel
-            if x % 4 == 0 and y % 4 == 0:  # Only modify some pixels for performance
-                draw.point((x, y), fill=(r, g, b))
-    
-    # Add some "stains" to make it look aged
-    for _ in range(40):
-        x = random.randint(0, width)
-        y = random.randint(0, height)
-        radius = random.randint(5, 50)
-        opacity = random.randint(5, 20)
-        color = (200 - random.randint(0, 30), 190 - random.randint(0, 40), 160 - random.randint(0, 40))
-        
-        # Draw a semi-transparent circle
-        for r in range(radius):
-            draw.ellipse((x-r, y-r, x+r, y+r), fill=color + (opacity,))
-    
-    # Apply slight blur for a smoother look
-    img = img.filter(ImageFilter.GaussianBlur(radius=1))
-    
-    return img
+
+    # Unregelmäßiger Wachsrand
+    outline = []
+    for i in range(72):
+        angle = 2 * math.pi * i / 72
+        r = c * (0.94 + 0.05 * rng.random())
+        outline.append((c + r * math.cos(angle), c + r * math.sin(angle)))
+    draw.polygon(outline, fill=wax + (255,))
+    ring = c * 0.80
+    draw.ellipse((c - ring, c - ring, c + ring, c + ring), outline=_shade(wax, 0.7) + (255,), width=max(1, ss // 60))
+    draw.ellipse((c - ring * 0.9, c - ring * 0.9, c + ring * 0.9, c + ring * 0.9), fill=_shade(wax, 1.15) + (255,))
+    for i in range(beads):
+        angle = 2 * math.pi * i / beads
+        bx, by = c + c * 0.87 * math.cos(angle), c + c * 0.87 * math.sin(angle)
+        br = ss / 70
+        draw.ellipse((bx - br, by - br, bx + br, by + br), fill=_shade(wax, 1.3) + (255,))
+
+    # Wappenschild
+    w, h = ss * 0.42, ss * 0.48
+    left, top = c - w / 2, c - h / 2
+    shield = [(left, top), (left + w, top), (left + w, top + h * 0.55), (c, top + h), (left, top + h * 0.55)]
+    def division_layer(base, other):
+        layer = Image.new('RGBA', (ss, ss), base + (255,))
+        layer_draw = ImageDraw.Draw(layer)
+        if division == "per_pale":
+            layer_draw.rectangle((c, 0, ss, ss), fill=other + (255,))
+        elif division == "per_fess":
+            layer_draw.rectangle((0, top + h * 0.45, ss, ss), fill=other + (255,))
+        elif division == "quarterly":
+            layer_draw.rectangle((c, 0, ss, top + h * 0.45), fill=other + (255,))
+            layer_draw.rectangle((0, top + h * 0.45, c, ss), fill=other + (255,))
+        elif division == "per_bend":
+            layer_draw.polygon([(left, top), (left + w, top + h), (left + w, top)], fill=other + (255,))
+        return layer
+
+    # Wappenfigur in den Gegenfarben (auf geteiltem Schild verwechselt), mit dunkler Kontur
+    cy = top + h * 0.42
+    r = w * 0.26
+    charge_mask = Image.new('L', (ss, ss), 0)
+    charge_draw = ImageDraw.Draw(charge_mask)
+    if charge == "star":
+        shapes = [_star(c, cy, r)]
+    elif charge == "cross":
+        t = r * 0.35
+        shapes = [[(c - t, cy - r), (c + t, cy - r), (c + t, cy + r), (c - t, cy + r)],
+                  [(c - r, cy - t), (c + r, cy - t), (c + r, cy + t), (c - r, cy + t)]]
+    elif charge == "chevron":
+        t = r * 0.45
+        shapes = [[(c - r * 1.3, cy + r), (c, cy - r * 0.5), (c + r * 1.3, cy + r),
+                   (c + r * 1.3, cy + r + t), (c, cy - r * 0.5 + t), (c - r * 1.3, cy + r + t)]]
+    elif charge == "lozenge":
+        shapes = [[(c, cy - r), (c + r * 0.7, cy), (c, cy + r), (c - r * 0.7, cy)]]
+    else:
+        shapes = []
+        charge_draw.ellipse((c - r * 0.8, cy - r * 0.8, c + r * 0.8, cy + r * 0.8), fill=255)
+    for shape in shapes:
+        charge_draw.polygon(shape, fill=255)
+
+    arms = division_layer(field, second)
+    arms.paste(division_layer(second, field), (0, 0), charge_mask)
+    charge_edges = charge_mask.filter(ImageFilter.FIND_EDGES).point(lambda v: 255 if v else 0)
+    arms.paste(_shade(wax, 0.45) + (255,), (0, 0), charge_edges.filter(ImageFilter.MaxFilter(3)))
+
+    mask = Image.new('L', (ss, ss), 0)
+    ImageDraw.Draw(mask).polygon(shield, fill=255)
+    img.paste(arms, (0, 0), mask)
+    draw.polygon(shield, outline=_shade(wax, 0.55) + (255,), width=max(1, ss // 90))
+
+    return img.resize((size, size), Image.LANCZOS)
+
+class SealCache:
+    """
+    Siegel pro Land: einmal gezeichnet, als PNG unter assets/seals/ abgelegt und im Speicher
+    pro Größe gehalten. Das Einsetzen in ein Dokument kostet damit nur noch ein paste().
+    """
+
+    def __init__(self, directory, master_size=256):
+        self.directory = directory
+        self.master_size = master_size
+        self._masters = {}
+        self._sprites = {}
+        self._write_failed = False
+        self._lock = threading.Lock()
+
+    def path(self, country):
+        slug = "".join(ch if ch.isalnum() else "_" for ch in country.strip().lower())[:40]
+        digest = hashlib.sha256(country.strip().lower().encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.directory, f"{slug}_{digest}_v{SEAL_VERSION}_{self.master_size}.png")
+
+    def _master(self, country):
+        master = self._masters.get(country)
+        if master is not None:
+            return master
+        path = self.path(country)
+        try:
+            with Image.open(path) as cached:
+                master = cached.convert('RGBA')
+        except (OSError, ValueError):
+            master = generate_seal(country, self.master_size)
+            self._save(master, path)
+        with self._lock:
+            return self._masters.setdefault(country, master)
+
+    def _save(self, master, path):
+        if self._write_failed:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Erst in eine temporäre Datei, damit parallele Render-Worker keine halben Dateien lesen
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            master.save(tmp_path, format='PNG')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._write_failed = True
+            logger.warning(f"Siegel können nicht unter {self.directory} gespeichert werden: {e}")
+
+    def get(self, country, size):
+        """RGBA seal sprite for country with the given diameter in pixels"""
+        key = (country, size)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            master = self._master(country)
+            sprite = master if size == master.width else master.resize((size, size), Image.LANCZOS)
+            with self._lock:
+                sprite = self._sprites.setdefault(key, sprite)
+        return sprite
+
+seal_cache = SealCache(os.path.join(BASE_DIR, 'assets', 'seals'))
+
+@functools.lru_cache(maxsize=None)
+def compiled_layout(kind):
+    """Compile the layout for 'trade' or a treaty type once per process"""
+    template = TRADE_TEMPLATE if kind == "trade" else treaty_template(kind)
+    return compile_template(template)
+
+@dataclass(frozen=True)
+class OutputProfile:
+    """Kodierung eines fertigen Vertragsbilds: Format, Speicheroptionen und optionale Palette"""
+    format: str
+    extension: str
+    options: tuple = ()
+    colors: int = None
+
+OUTPUT_PROFILES = {
+    # Standard-PNG wie bisher
+    "png": OutputProfile("PNG", "png"),
+    # Schnell kodiert, etwas größer - für kurzlebige Vorschauen
+    "png_fast": OutputProfile("PNG", "png", (("compress_level", 1),)),
+    # Maximale verlustfreie Kompression für das Archiv, sehr langsam zu kodieren
+    "png_optimized": OutputProfile("PNG", "png", (("optimize", True),)),
+    # Das überwiegend beige Pergament kommt mit 256 Palettenfarben aus
+    "png_palette": OutputProfile("PNG", "png", (("optimize", True),), colors=256),
+    "webp_lossless": OutputProfile("WEBP", "webp", (("lossless", True), ("quality", 80), ("method", 4))),
+    "webp": OutputProfile("WEBP", "webp", (("quality", 85), ("method", 4))),
+    "jpeg": OutputProfile("JPEG", "jpg", (("quality", 88), ("optimize", True))),
+    # Vektorausgabe direkt aus den Layout-Operationen, ohne Pergament-Rasterung: klein und in Millisekunden fertig
+    "pdf": OutputProfile("PDF", "pdf"),
+    "svg": OutputProfile("SVG", "svg"),
+}
+
+VECTOR_FORMATS = ("PDF", "SVG")
+
+def encode_image(img, profile="png", metadata=None):
+    """
+    Encode img with the named output profile and return a BytesIO positioned at 0.
+    metadata (str -> str) is stored as PNG text chunks; other formats ignore it.
+    """
+    output = OUTPUT_PROFILES[profile]
+    if output.colors:
+        img = img.quantize(colors=output.colors, method=Image.Quantize.FASTOCTREE)
+    options = dict(output.options)
+    if metadata and output.format == "PNG":
+        info = PngInfo()
+        for key, value in metadata.items():
+            info.add_text(key, value)
+        options["pnginfo"] = info
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format=output.format, **options)
+    img_byte_arr.seek(0)
+    return img_byte_arr
+
+def _render_vector(kind, fields, output):
+    layout = compiled_layout(kind)
+    with render_stats.stage("vector"):
+        if output.format == "PDF":
+            title = f"{layout.template.name}: {fields['initiator_country']} - {fields['partner_country']}"
+            documents = [vector_output.pdf_document(layout, fields, seal_cache.get, title)]
+        else:
+            documents = vector_output.svg_pages(layout, fields, seal_cache.get)
+    return [io.BytesIO(document) for document in documents]
+
+def _render(kind, fields, quality, output_profile, seed, pages):
+    tier = RENDER_TIERS[quality]
+    output = OUTPUT_PROFILES[output_profile or tier.output_profile]
+    if output.format in VECTOR_FORMATS:
+        # Ein PDF enthält alle Seiten, SVG liefert eine Datei je Seite
+        with render_stats.profile_document(kind if kind == "trade" else "treaty"):
+            encoded = _render_vector(kind, fields, output)
+        return encoded if pages else encoded[0]
+    pool = background_pools[quality]
+    seed = seed_from_id(seed)
+    if seed is None:
+        seed = random.randrange(pool.size)
+    # Folgeseiten nehmen die nächsten Varianten, damit sich die Flecken nicht wiederholen
+    with render_stats.profile_document(kind if kind == "trade" else "treaty"):
+        images = compiled_layout(kind).render(
+            fields, lambda page, height: pool.get(seed + page, height), tier.scale, seals=seal_cache.get
+        )
+        with render_stats.stage("encode"):
+            # Stufe und Profil im Dokument vermerken, auch wenn sie unter Last heruntergesetzt wurden
+            metadata = {"Software": "Kurator", "Quality": quality, "Profile": output_profile or tier.output_profile}
+            encoded = [encode_image(img, output_profile or tier.output_profile, metadata) for img in images]
+    if pages:
+        return encoded
+    if len(encoded) > 1:
+        logger.warning(f"Dokument '{kind}' hat {len(encoded)} Seiten, nur die erste wird zurückgegeben (pages=True)")
+    return encoded[0]
+
+def output_filename(basename, profile="png"):
+    """File name with the extension matching the output profile"""
+    return f"{basename}.{OUTPUT_PROFILES[profile].extension}"
+
+def page_filenames(count, filename):
+    """handelsvertrag.png for a single page, handelsvertrag_1.png, handelsvertrag_2.png, ... otherwise"""
+    if count == 1:
+        return [filename]
+    stem, dot, extension = filename.rpartition('.')
+    return [f"{stem}_{number}{dot}{extension}" for number in range(1, count + 1)]
 
 def generate_trade_agreement_image(initiator_name, partner_name, 
                                   initiator_country, partner_country,
                                   offer_resource, offer_amount,
                                   request_resource, request_amount,
-                                  timestamp=None, vertragsbruch_klausel="", anmerkungen=""):
+                                  timestamp=None, vertragsbruch_klausel="", anmerkungen="",
+                                  output_profile=None, seed=None, quality="full", pages=False):
     """
     Erstellt ein Bild eines Handelsvertrags im klaren, formellen Stil.
-    Gibt ein BytesIO-Objekt zurück, das das Bild enthält.
+    Gibt ein BytesIO-Objekt zurück, das das Bild im Format von output_profile enthält
+    (ohne Angabe das Standardprofil der Qualitätsstufe, siehe RENDER_TIERS).
+    Die Seite ist so hoch wie ihr Inhalt; mit pages=True kommt eine Liste aller Seiten zurück.
+    Die Profile "pdf" (ein PDF mit allen Seiten) und "svg" (je Seite) zeichnen ohne Rasterung.
+    Mit seed (z.B. der Trade-ID) ergeben gleiche Eingaben byte-identische Bilder.
     """
     # Verwende aktuelle Zeit, falls nicht angegeben
     if timestamp is None:
         timestamp = datetime.now().strftime("%d.%m.%Y, %H:%M Uhr")
     
-    # Erstelle Pergament-Hintergrund
-    img = generate_parchment_background()
-    width, height = img.size
-    draw = ImageDraw.Draw(img)
-    
-    # Lade Schriftarten
-    title_font = get_font('garamond', 48)
-    header_font = get_font('garamond', 34)
-    content_font = get_font('garamond', 24)
-    small_font = get_font('garamond', 18)
-    
-    # Titel
-    title = "HANDELSVERTRAG"
-    title_width = draw.textlength(title, font=title_font)
-    draw.text(((width - title_width) // 2, 50), title, fill=(10, 10, 40), font=title_font)
-    
-    # Linie unter dem Titel
-    draw.line([(width//4, 120), (3*width//4, 120)], fill=(70, 30, 10), width=2)
-    
-    # Unterzeichner-Header
-    draw.text((50, 160), "Zwischen den ehrenwerten Herrschern", fill=(10, 10, 40), font=header_font)
-    
-    # Unterzeichner
-    draw.text((100, 220), f"{initiator_name} von {initiator_country}", fill=(10, 10, 40), font=content_font)
-    draw.text((100, 260), f"und", fill=(10, 10, 40), font=content_font)
-    draw.text((100, 300), f"{partner_name} von {partner_country}", fill=(10, 10, 40), font=content_font)
-    
-    # Vereinbarung-Header
-    draw.text((50, 370), "Wurde folgende Handelsvereinbarung getroffen:", fill=(10, 10, 40), font=header_font)
-    
-    # Angebot und Nachfrage
-    draw.text((100, 440), f"{initiator_country} bietet:", fill=(10, 10, 40), font=content_font)
-    draw.text((150, 480), f"{offer_amount} {offer_resource}", fill=(10, 10, 40), font=content_font)
-    
-    draw.text((100, 540), f"{partner_country} bietet:", fill=(10, 10, 40), font=content_font)
-    draw.text((150, 580), f"{request_amount} {request_resource}", fill=(10, 10, 40), font=content_font)
-    
-    # Vertragsbruch-Klausel
-    if vertragsbruch_klausel:
-        draw.text((50, 650), "Vertragsbruch-Klausel:", fill=(10, 10, 40), font=content_font)
-        
-        # Text-Wrapping für lange Klauseln
-        wrapped_text = textwrap.fill(vertragsbruch_klausel, width=50)
-        y_position = 690
-        for line in wrapped_text.split('\n'):
-            draw.text((70, y_position), line, fill=(10, 10, 40), font=small_font)
-            y_position += 25
-    else:
-        y_position = 650
-    
-    # Anmerkungen
-    if anmerkungen:
-        draw.text((50, y_position + 40), "Anmerkungen:", fill=(10, 10, 40), font=content_font)
-        
-        wrapped_anmerkungen = textwrap.fill(anmerkungen, width=50)
-        y_position += 80
-        for line in wrapped_anmerkungen.split('\n'):
-            draw.text((70, y_position), line, fill=(10, 10, 40), font=small_font)
-            y_position += 25
-    
-    # Unterzeichnet und Datum
-    y_position = max(y_position + 70, 820)
-    
-    date_text = f"Unterzeichnet am {timestamp}"
-    date_width = draw.textlength(date_text, font=content_font)
-    draw.text(((width - date_width) // 2, y_position), date_text, fill=(10, 10, 40), font=content_font)
-    
-    # Unterschriftslinien
-    sign_y = y_position + 70
-    line_width = width // 3
-    
-    # Erste Unterschrift
-    draw.line([(width//6, sign_y), (width//6 + line_width, sign_y)], fill=(30, 30, 30), width=1)
-    name_text = initiator_name
-    name_width = draw.textlength(name_text, font=small_font)
-    draw.text(((width//6 + line_width//2 - name_width//2), sign_y + 10), name_text, fill=(10, 10, 40), font=small_font)
-    
-    # Zweite Unterschrift
-    draw.line([(width//2 + width//6, sign_y), (width//2 + width//6 + line_width, sign_y)], fill=(30, 30, 30), width=1)
-    name_text = partner_name
-    name_width = draw.textlength(name_text, font=small_font)
-    draw.text(((width//2 + width//6 + line_width//2 - name_width//2), sign_y + 10), name_text, fill=(10, 10, 40), font=small_font)
-    
-    # Dekorative Elemente - Siegel/Wappen
-    seal_size = 100
-    seal_padding = 30
-    
-    # Erstes Siegel links
-    seal_x = width//6 + line_width//2 - seal_size//2
-    seal_y = sign_y + 50
-    draw.ellipse((seal_x - seal_padding, seal_y - seal_padding, 
-                 seal_x + seal_size + seal_padding, seal_y + seal_size + seal_padding), 
-                 outline=(120, 40, 30), width=3)
-    
-    # Zweites Siegel rechts
-    seal_x = width//2 + width//6 + line_width//2 - seal_size//2
-    draw.ellipse((seal_x - seal_padding, seal_y - seal_padding, 
-                 seal_x + seal_size + seal_padding, seal_y + seal_size + seal_padding), 
-                 outline=(120, 40, 30), width=3)
-    
-    # Generiere das Bild als Bytes-Objekt
-    img_byte_arr = io.BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    
-    return img_byte_arr
+    fields = {
+        "initiator_name": initiator_name,
+        "partner_name": partner_name,
+        "initiator_country": initiator_country,
+        "partner_country": partner_country,
+        "offer_resource": offer_resource,
+        "offer_amount": offer_amount,
+        "request_resource": request_resource,
+        "request_amount": request_amount,
+        "timestamp": timestamp,
+        "vertragsbruch_klausel": vertragsbruch_klausel,
+        "anmerkungen": anmerkungen,
+    }
+    return _render("trade", fields, quality, output_profile, seed, pages)
 
 def generate_treaty_image(initiator_name, partner_name, 
                           initiator_country, partner_country,
                           treaty_type, expiry_date=None,
-                          vertragsbruch_klausel="", anmerkungen=""):
+                          vertragsbruch_klausel="", anmerkungen="", signing_date=None,
+                          output_profile=None, seed=None, quality="full", pages=False):
     """
     Erstellt ein Bild eines Vertrags im formellen diplomatischen Stil.
-    Gibt ein BytesIO-Objekt zurück, das das Bild enthält.
+    Gibt ein BytesIO-Objekt zurück, das das Bild im Format von output_profile enthält
+    (ohne Angabe das Standardprofil der Qualitätsstufe, siehe RENDER_TIERS).
+    Die Seite ist so hoch wie ihr Inhalt; mit pages=True kommt eine Liste aller Seiten zurück.
+    Die Profile "pdf" (ein PDF mit allen Seiten) und "svg" (je Seite) zeichnen ohne Rasterung.
+    Mit seed (z.B. der Treaty-ID) ergeben gleiche Eingaben byte-identische Bilder.
     """
-    # Aktuelles Datum, falls kein Ablaufdatum angegeben
-    current_date = datetime.now().strftime("%d.%m.%Y")
-    if expiry_date is None:
-        expiry_date = "unbegrenzt"
-    
-    # Erstelle Pergament-Hintergrund
-    img = generate_parchment_background()
-    width, height = img.size
-    draw = ImageDraw.Draw(img)
-    
-    # Lade Schriftarten
-    title_font = get_font('garamond', 48)
-    header_font = get_font('garamond', 34)
-    content_font = get_font('garamond', 24)
-    small_font = get_font('garamond', 18)
-    
-    # Titel
-    title = treaty_type.upper()
-    title_width = draw.textlength(title, font=title_font)
-    draw.text(((width - title_width) // 2, 50), title, fill=(10, 10, 40), font=title_font)
-    
-    # Linie unter dem Titel
-    draw.line([(width//4, 120), (3*width//4, 120)], fill=(70, 30, 10), width=2)
-    
-    # Unterzeichner-Header
-    draw.text((50, 160), "Zwischen den ehrenwerten Herrschern", fill=(10, 10, 40), font=header_font)
-    
-    # Unterzeichner
-    draw.text((100, 220), f"{initiator_name} von {initiator_country}", fill=(10, 10, 40), font=content_font)
-    draw.text((100, 260), f"und", fill=(10, 10, 40), font=content_font)
-    draw.text((100, 300), f"{partner_name} von {partner_country}", fill=(10, 10, 40), font=content_font)
-    
-    # Vereinbarung-Header
-    draw.text((50, 370), "Wird folgender Vertrag geschlossen:", fill=(10, 10, 40), font=header_font)
-    
-    # Vertragsinhalt - je nach Vertragstyp
-    treaty_explanation = ""
-    if treaty_type == "Nichtangriffspakt":
-        treaty_explanation = "Die unterzeichnenden Parteien verpflichten sich, für die Dauer des Vertrags keine militärischen Aktionen gegeneinander durchzuführen und von feindlichen Handlungen abzusehen."
-    elif treaty_type == "Schutzbündnis":
-        treaty_explanation = "Im Falle eines Angriffs auf eine der unterzeichnenden Parteien verpflichtet sich die andere Partei, militärischen Beistand zu leisten und der angegriffenen Partei zur Seite zu stehen."
-    elif treaty_type == "Allianzvertrag":
-        treaty_explanation = "Die unterzeichnenden Parteien verpflichten sich zu einer umfassenden Allianz, die militärische, wirtschaftliche und diplomatische Zusammenarbeit umfasst. Keine Partei darf ohne Zustimmung der anderen in Konflikte eintreten."
-    elif treaty_type == "Hochzeitspakt":
-        treaty_explanation = "Durch die Verbindung der Herrscherhäuser in einer Hochzeit verpflichten sich die Parteien zu ewiger Freundschaft, gegenseitiger Unterstützung und der Förderung beider Reiche als vereinte Familie."
-    elif treaty_type == "Großallianzvertrag":
-        treaty_explanation = "Die Parteien schließen sich in einer Großallianz zusammen, die alle Aspekte der zwischenstaatlichen Beziehungen umfasst. Dies beinhaltet gemeinsame Verteidigung, wirtschaftliche Integration und eine vereinte Außenpolitik."
-    
-    # Vertragsinhalt
-    wrapped_explanation = textwrap.fill(treaty_explanation, width=50)
-    y_position = 440
-    for line in wrapped_explanation.split('\n'):
-        draw.text((70, y_position), line, fill=(10, 10, 40), font=content_font)
-        y_position += 35
-    
-    # Vertragsdauer
-    y_position += 20
-    draw.text((70, y_position), f"Vertragsdauer: {expiry_date}", fill=(10, 10, 40), font=content_font)
-    
-    # Vertragsbruch-Klausel
-    if vertragsbruch_klausel:
-        y_position += 50
-        draw.text((50, y_position), "Vertragsbruch-Klausel:", fill=(10, 10, 40), font=content_font)
-        
-        # Text-Wrapping für lange Klauseln
-        wrapped_text = textwrap.fill(vertragsbruch_klausel, width=50)
-        y_position += 40
-        for line in wrapped_text.split('\n'):
-            draw.text((70, y_position), line, fill=(10, 10, 40), font=small_font)
-            y_position += 25
-    
-    # Anmerkungen
-    if anmerkungen:
-        y_position += 30
-        draw.text((50, y_position), "Anmerkungen:", fill=(10, 10, 40), font=content_font)
-        
-        wrapped_anmerkungen = textwrap.fill(anmerkungen, width=50)
-        y_position += 40
-        for line in wrapped_anmerkungen.split('\n'):
-            draw.text((70, y_position), line, fill=(10, 10, 40), font=small_font)
-            y_position += 25
-    
-    # Unterzeichnet und Datum
-    y_position = max(y_position + 50, 820)
-    
-    date_text = f"Unterzeichnet am {current_date}"
-    date_width = draw.textlength(date_text, font=content_font)
-    draw.text(((width - date_width) // 2, y_position), date_text, fill=(10, 10, 40), font=content_font)
-    
-    # Unterschriftslinien
-    sign_y = y_position + 70
-    line_width = width // 3
-    
-    # Erste Unterschrift
-    draw.line([(width//6, sign_y), (width//6 + line_width, sign_y)], fill=(30, 30, 30), width=1)
-    name_text = initiator_name
-    name_width = draw.textlength(name_text, font=small_font)
-    draw.text(((width//6 + line_width//2 - name_width//2), sign_y + 10), name_text, fill=(10, 10, 40), font=small_font)
-    
-    # Zweite Unterschrift
-    draw.line([(width//2 + width//6, sign_y), (width//2 + width//6 + line_width, sign_y)], fill=(30, 30, 30), width=1)
-    name_text = partner_name
-    name_width = draw.textlength(name_text, font=small_font)
-    draw.text(((width//2 + width//6 + line_width//2 - name_width//2), sign_y + 10), name_text, fill=(10, 10, 40), font=small_font)
-    
-    # Dekorative Elemente - Siegel/Wappen
-    seal_size = 100
-    seal_padding = 30
-    
-    # Erstes Siegel links
-    seal_x = width//6 + line_width//2 - seal_size//2
-    seal_y = sign_y + 50
-    draw.ellipse((seal_x - seal_padding, seal_y - seal_padding, 
-                 seal_x + seal_size + seal_padding, seal_y + seal_size + seal_padding), 
-                 outline=(120, 40, 30), width=3)
-    
-    # Zweites Siegel rechts
-    seal_x = width//2 + width//6 + line_width//2 - seal_size//2
-    draw.ellipse((seal_x - seal_padding, seal_y - seal_padding, 
-                 seal_x + seal_size + seal_padding, seal_y + seal_size + seal_padding), 
-                 outline=(120, 40, 30), width=3)
-    
-    # Generiere das Bild als Bytes-Objekt
-    img_byte_arr = io.BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    
-    return img_byte_arr
\ No newline at end of file
+    fields = {
+        "initiator_name": initiator_name,
+        "partner_name": partner_name,
+        "initiator_country": initiator_country,
+        "partner_country": partner_country,
+        "expiry_date": expiry_date if expiry_date is not None else "unbegrenzt",
+        "signing_date": signing_date or datetime.now().strftime("%d.%m.%Y"),
+        "vertragsbruch_klausel": vertragsbruch_klausel,
+        "anmerkungen": anmerkungen,
+    }
+    return _render(treaty_type, fields, quality, output_profile, seed, pages)
@@ -0,0 +1,464 @@
+from dataclasses import dataclass, replace
+from string import Formatter
+from PIL import Image, ImageDraw
+from utils import render_stats
+from utils.fonts import font_registry
+
+TEXT_COLOR = (10, 10, 40)
+CENTER = 'center'
+FONT_FACE = 'garamond'
+
+# Schriftrollen der Vorlagen und ihre Größen
+FONT_SIZES = {
+    'title': 48,
+    'header': 34,
+    'content': 24,
+    'small': 18,
+}
+
+TREATY_EXPLANATIONS = {
+    "Nichtangriffspakt": "Die unterzeichnenden Parteien verpflichten sich, für die Dauer des Vertrags keine militärischen Aktionen gegeneinander durchzuführen und von feindlichen Handlungen abzusehen.",
+    "Schutzbündnis": "Im Falle eines Angriffs auf eine der unterzeichnenden Parteien verpflichtet sich die andere Partei, militärischen Beistand zu leisten und der angegriffenen Partei zur Seite zu stehen.",
+    "Allianzvertrag": "Die unterzeichnenden Parteien verpflichten sich zu einer umfassenden Allianz, die militärische, wirtschaftliche und diplomatische Zusammenarbeit umfasst. Keine Partei darf ohne Zustimmung der anderen in Konflikte eintreten.",
+    "Hochzeitspakt": "Durch die Verbindung der Herrscherhäuser in einer Hochzeit verpflichten sich die Parteien zu ewiger Freundschaft, gegenseitiger Unterstützung und der Förderung beider Reiche als vereinte Familie.",
+    "Großallianzvertrag": "Die Parteien schließen sich in einer Großallianz zusammen, die alle Aspekte der zwischenstaatlichen Beziehungen umfasst. Dies beinhaltet gemeinsame Verteidigung, wirtschaftliche Integration und eine vereinte Außenpolitik.",
+}
+
+def _is_static(text):
+    """A text is static if it has no {placeholders} to fill per document"""
+    return not any(name is not None for _, name, _, _ in Formatter().parse(text))
+
+# Elemente einer Vorlage
+
+@dataclass(frozen=True)
+class Text:
+    """Single line at an absolute position; x may be CENTER"""
+    text: str
+    x: object
+    y: int
+    font: str = 'content'
+    fill: tuple = TEXT_COLOR
+
+@dataclass(frozen=True)
+class Rule:
+    """Horizontal line; start and end are fractions of the page width"""
+    y: int
+    start: float
+    end: float
+    fill: tuple = (70, 30, 10)
+    width: int = 2
+
+@dataclass(frozen=True)
+class Spacer:
+    """Advance the flow cursor"""
+    height: int
+
+@dataclass(frozen=True)
+class FlowText:
+    """Single line at the flow cursor, advancing it by `advance`"""
+    text: str
+    x: int
+    font: str = 'content'
+    advance: int = 0
+
+@dataclass(frozen=True)
+class Paragraph:
+    """Wrapped text at the flow cursor, one line_height per line; max_width defaults to symmetric margins"""
+    text: str
+    x: int
+    font: str
+    line_height: int
+    max_width: int = None
+
+@dataclass(frozen=True)
+class Section:
+    """Labelled block filled from a field, skipped entirely when the field is empty"""
+    label: str
+    field: str
+    gap: int
+    body_offset: int = 40
+    label_x: int = 50
+    body_x: int = 70
+    label_font: str = 'content'
+    body_font: str = 'small'
+    line_height: int = 25
+    max_width: int = None
+
+@dataclass(frozen=True)
+class Signatures:
+    """Centred signing date, signature lines, signer names and seals below the flow"""
+    date_text: str
+    gap: int
+    min_y: int = 0
+    block_offset: int = 70
+
+@dataclass(frozen=True)
+class Template:
+    """
+    Page layout: absolutely placed elements plus a vertical flow starting at flow_start.
+    Pages are as tall as their content, between min_height and max_height; longer
+    documents continue on further pages.
+    """
+    name: str
+    fixed: tuple
+    flow_start: int
+    flow: tuple
+    width: int = 800
+    min_height: int = 900
+    max_height: int = 1600
+
+# Zeichenoperationen, die ein kompiliertes Layout erzeugt
+
+@dataclass(frozen=True)
+class TextOp:
+    x: int
+    y: int
+    text: str
+    size: int
+    fill: tuple = TEXT_COLOR
+
+@dataclass(frozen=True)
+class LineOp:
+    points: tuple
+    fill: tuple
+    width: int
+
+@dataclass(frozen=True)
+class EllipseOp:
+    box: tuple
+    outline: tuple
+    width: int
+
+def _font(size):
+    return font_registry.get(FONT_FACE, size)
+
+def execute(draw, ops, scale=1):
+    """Run a list of draw operations against an ImageDraw canvas, optionally scaled (e.g. 0.5 for previews)"""
+    for op in ops:
+        if isinstance(op, TextOp):
+            draw.text((op.x * scale, op.y * scale), op.text, fill=op.fill, font=_font(round(op.size * scale)))
+        elif isinstance(op, LineOp):
+            points = [(x * scale, y * scale) for x, y in op.points]
+            draw.line(points, fill=op.fill, width=max(1, round(op.width * scale)))
+        elif isinstance(op, EllipseOp):
+            box = tuple(v * scale for v in op.box)
+            draw.ellipse(box, outline=op.outline, width=max(1, round(op.width * scale)))
+
+def _render_layer(ops, width, height, scale=1):
+    """Render ops onto a transparent layer, cropped to its content; returns (layer, offset)"""
+    layer = Image.new('RGBA', (round(width * scale), round(height * scale)), (0, 0, 0, 0))
+    execute(ImageDraw.Draw(layer), ops, scale)
+    bbox = layer.getbbox()
+    if bbox is None:
+        return None, (0, 0)
+    return layer.crop(bbox), (bbox[0], bbox[1])
+
+# Höhe des Unterschriftenblocks ab der Unterschriftslinie (Siegel inklusive) und Seitenränder
+SIGNATURE_HEIGHT = 210
+PAGE_MARGIN_TOP = 80
+PAGE_MARGIN_BOTTOM = 30
+
+@dataclass(frozen=True)
+class Page:
+    """One page of a laid-out document: its draw ops, signature line (or None) and height"""
+    ops: tuple
+    sign_y: object
+    height: int
+
+def _op_bottom(op):
+    if isinstance(op, TextOp):
+        return op.y + round(op.size * 1.3)
+    return op.y
+
+# Siegelfelder: Durchmesser des Rings und Mittelpunkt unterhalb der Unterschriftslinie
+SEAL_DIAMETER = 160
+SEAL_CENTER_Y = 120
+
+def seal_slots(width):
+    """Centres of the initiator's and partner's seal, relative to the signature line at y=0"""
+    line_width = width // 3
+    return [(left + line_width//2, SEAL_CENTER_Y) for left in (width//6, width//2 + width//6)]
+
+def _shift(op, dy):
+    """Move a line or ellipse op down by dy"""
+    if isinstance(op, LineOp):
+        return replace(op, points=tuple((x, y + dy) for x, y in op.points))
+    x0, y0, x1, y1 = op.box
+    return replace(op, box=(x0, y0 + dy, x1, y1 + dy))
+
+def _signature_ops(width):
+    """Signature lines and seal rings relative to the signature line at y=0"""
+    line_width = width // 3
+    radius = SEAL_DIAMETER // 2
+    ops = []
+    for left, (x, y) in zip((width//6, width//2 + width//6), seal_slots(width)):
+        ops.append(LineOp(((left, 0), (left + line_width, 0)), (30, 30, 30), 1))
+        ops.append(EllipseOp((x - radius, y - radius, x + radius, y + radius), (120, 40, 30), 3))
+    return ops
+
+class CompiledLayout:
+    """
+    Ergebnis von compile_template: statische Elemente sind bereits vermessen und als
+    transparente Ebenen vorgerendert, pro Dokument bleibt nur der variable Teil.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        width = template.width
+
+        static_ops = []
+        self.dynamic = []
+        for element in template.fixed:
+            if isinstance(element, Rule):
+                static_ops.append(LineOp(
+                    ((int(width * element.start), element.y), (int(width * element.end), element.y)),
+                    element.fill, element.width
+                ))
+            elif _is_static(element.text):
+                static_ops.append(self._text_op(element.text, element.x, element.y, element.font, element.fill))
+            else:
+                self.dynamic.append(element)
+
+        # Statischer Anfang des Flusses hat feste Positionen und wandert ebenfalls in die Ebene
+        cursor = template.flow_start
+        flow = list(template.flow)
+        while flow and self._flow_static(flow[0]):
+            cursor = self._place(flow.pop(0), {}, cursor, static_ops)
+        self.flow_start = cursor
+        self.flow = flow
+
+        self.static_ops = static_ops
+        self.static_bottom = max([cursor] + [_op_bottom(op) for op in static_ops if isinstance(op, TextOp)])
+        self.block_offset = next((e.block_offset for e in self.flow if isinstance(e, Signatures)), 0)
+        self._layers = {}
+        self.overlay, self.overlay_offset, self.signature_layer, self.signature_offset = self.layers(1)
+
+    def layers(self, scale):
+        """Static overlay and signature block rendered at scale, built once per scale"""
+        layers = self._layers.get(scale)
+        if layers is None:
+            width = self.template.width
+            overlay, overlay_offset = _render_layer(self.static_ops, width, self.template.max_height, scale)
+            signature, signature_offset = _render_layer(_signature_ops(width), width, SIGNATURE_HEIGHT, scale)
+            layers = self._layers.setdefault(scale, (overlay, overlay_offset, signature, signature_offset))
+        return layers
+
+    @staticmethod
+    def _flow_static(element):
+        if isinstance(element, Spacer):
+            return True
+        if isinstance(element, (FlowText, Paragraph)):
+            return _is_static(element.text)
+        return False
+
+    def _text_op(self, text, x, y, font_role, fill=TEXT_COLOR):
+        size = FONT_SIZES[font_role]
+        if x == CENTER:
+            x = (self.template.width - font_registry.measure(text, size, FONT_FACE)) // 2
+        return TextOp(x, y, text, size, fill)
+
+    def _wrap(self, text, x, font_role, max_width):
+        if max_width is None:
+            max_width = self.template.width - 2 * x
+        return font_registry.wrap(text, FONT_SIZES[font_role], max_width, FONT_FACE)
+
+    def _place(self, element, fields, cursor, ops):
+        """Lay out one flow element at cursor, append its ops and return the new cursor"""
+        if isinstance(element, Spacer):
+            return cursor + element.height
+        if isinstance(element, FlowText):
+            ops.append(self._text_op(element.text.format_map(fields), element.x, cursor, element.font))
+            return cursor + element.advance
+        if isinstance(element, Paragraph):
+            text = element.text.format_map(fields)
+            for line in self._wrap(text, element.x, element.font, element.max_width):
+                ops.append(self._text_op(line, element.x, cursor, element.font))
+                cursor += element.line_height
+            return cursor
+        if isinstance(element, Section):
+            body = fields.get(element.field)
+            if not body:
+                return cursor
+            cursor += element.gap
+            ops.append(self._text_op(element.label, element.label_x, cursor, element.label_font))
+            cursor += element.body_offset
+            for line in self._wrap(body, element.body_x, element.body_font, element.max_width):
+                ops.append(self._text_op(line, element.body_x, cursor, element.body_font))
+                cursor += element.line_height
+            return cursor
+        raise TypeError(f"Unbekanntes Layout-Element: {element!r}")
+
+    def layout(self, fields):
+        """
+        Compute the per-document draw operations.
+        Returns the ops and the y position of the signature line (None without signatures).
+        """
+        ops = [
+            self._text_op(element.text.format_map(fields), element.x, element.y, element.font, element.fill)
+            for element in self.dynamic
+        ]
+
+        cursor = self.flow_start
+        sign_y = None
+        for element in self.flow:
+            if isinstance(element, Signatures):
+                date_y = max(cursor + element.gap, element.min_y)
+                ops.append(self._text_op(element.date_text.format_map(fields), CENTER, date_y, 'content'))
+                sign_y = date_y + element.block_offset
+                ops.extend(self._signer_ops(fields, sign_y))
+                cursor = sign_y
+            else:
+                cursor = self._place(element, fields, cursor, ops)
+        return ops, sign_y
+
+    def _signer_ops(self, fields, sign_y):
+        width = self.template.width
+        line_width = width // 3
+        size = FONT_SIZES['small']
+        ops = []
+        for left, name in ((width//6, fields['initiator_name']), (width//2 + width//6, fields['partner_name'])):
+            name_width = font_registry.measure(name, size, FONT_FACE)
+            ops.append(TextOp(left + line_width//2 - name_width//2, sign_y + 10, name, size))
+        return ops
+
+    def paginate(self, fields):
+        """
+        Measure the document and split it into pages no taller than max_height.
+        Lines that do not fit move to the next page; the signing date stays with the signatures.
+        """
+        template = self.template
+        ops, sign_y = self.layout(fields)
+        date_y = None if sign_y is None else sign_y - self.block_offset
+        limit = template.max_height - PAGE_MARGIN_BOTTOM
+
+        pages = []
+        page_ops, top, bottom = [], 0, self.static_bottom
+        for op in ops:
+            if date_y is not None and op.y >= date_y:
+                break
+            if _op_bottom(op) - top > limit:
+                pages.append(self._page(page_ops, None, bottom - top))
+                page_ops, top = [self._continuation(len(pages) + 1)], op.y - PAGE_MARGIN_TOP
+            page_ops.append(replace(op, y=op.y - top))
+            bottom = max(bottom, _op_bottom(op))
+
+        page_sign_y = None
+        if sign_y is not None:
+            if sign_y + SIGNATURE_HEIGHT - top > limit:
+                pages.append(self._page(page_ops, None, bottom - top))
+                page_ops, top = [self._continuation(len(pages) + 1)], date_y - PAGE_MARGIN_TOP
+            page_ops.extend(replace(op, y=op.y - top) for op in ops if op.y >= date_y)
+            page_sign_y = sign_y - top
+            bottom = sign_y + SIGNATURE_HEIGHT
+        pages.append(self._page(page_ops, page_sign_y, bottom - top))
+        return pages
+
+    def _page(self, ops, sign_y, content_height):
+        template = self.template
+        height = min(max(content_height + PAGE_MARGIN_BOTTOM, template.min_height), template.max_height)
+        return Page(tuple(ops), sign_y, height)
+
+    def _continuation(self, number):
+        return self._text_op(f"- {number} -", CENTER, PAGE_MARGIN_TOP // 3, 'small')
+
+    def render(self, fields, background, scale=1, seals=None):
+        """
+        Lay out the document and draw each page onto background(page_index, height), a canvas
+        of the page height times scale. Returns the page images.
+        seals(country, diameter) may return an RGBA sprite that is placed into the seal rings.
+        The layout is always computed at full size, so a preview breaks lines like the final document.
+        """
+        with render_stats.stage("layout"):
+            overlay, overlay_offset, signature, signature_offset = self.layers(scale)
+            pages = self.paginate(fields)
+        images = []
+        for page in pages:
+            with render_stats.stage("background"):
+                img = background(len(images), round(page.height * scale))
+            with render_stats.stage("compose"):
+                if not images and overlay is not None:
+                    img.paste(overlay, overlay_offset, overlay)
+                if page.sign_y is not None and signature is not None:
+                    x, y = signature_offset
+                    img.paste(signature, (x, round(page.sign_y * scale) + y), signature)
+            if page.sign_y is not None and seals is not None:
+                with render_stats.stage("seals"):
+                    self._paste_seals(img, fields, page.sign_y, scale, seals)
+            with render_stats.stage("text"):
+                execute(ImageDraw.Draw(img), page.ops, scale)
+            images.append(img)
+        return images
+
+    def seal_positions(self, fields, sign_y):
+        """(country, centre x, centre y) of each seal to place below the signature line at sign_y"""
+        countries = (fields.get('initiator_country'), fields.get('partner_country'))
+        return [
+            (country, x, sign_y + y)
+            for (x, y), country in zip(seal_slots(self.template.width), countries) if country
+        ]
+
+    def page_ops(self, page, first):
+        """All draw ops of a page, static overlay and signature block included (for vector output)"""
+        ops = list(self.static_ops) if first else []
+        if page.sign_y is not None:
+            ops.extend(_shift(op, page.sign_y) for op in _signature_ops(self.template.width))
+        ops.extend(page.ops)
+        return ops
+
+    def _paste_seals(self, img, fields, sign_y, scale, seals):
+        for country, x, y in self.seal_positions(fields, sign_y):
+            sprite = seals(country, round((SEAL_DIAMETER + 4) * scale))
+            img.paste(sprite, (round(x * scale) - sprite.width // 2, round(y * scale) - sprite.height // 2), sprite)
+
+def compile_template(template):
+    """Compile a template once, measuring with the shared font registry"""
+    return CompiledLayout(template)
+
+# Vorlagen
+
+_HEADER = (
+    Rule(120, 0.25, 0.75),
+    Text("Zwischen den ehrenwerten Herrschern", 50, 160, 'header'),
+    Text("{initiator_name} von {initiator_country}", 100, 220),
+    Text("und", 100, 260),
+    Text("{partner_name} von {partner_country}", 100, 300),
+)
+
+TRADE_TEMPLATE = Template(
+    name="trade",
+    fixed=(
+        Text("HANDELSVERTRAG", CENTER, 50, 'title'),
+        *_HEADER,
+        Text("Wurde folgende Handelsvereinbarung getroffen:", 50, 370, 'header'),
+        Text("{initiator_country} bietet:", 100, 440),
+        Text("{offer_amount} {offer_resource}", 150, 480),
+        Text("{partner_country} bietet:", 100, 540),
+        Text("{request_amount} {request_resource}", 150, 580),
+    ),
+    flow_start=650,
+    flow=(
+        Section("Vertragsbruch-Klausel:", 'vertragsbruch_klausel', gap=0),
+        Section("Anmerkungen:", 'anmerkungen', gap=40),
+        Signatures("Unterzeichnet am {timestamp}", gap=70),
+    ),
+)
+
+def treaty_template(treaty_type):
+    """Template for a treaty type; the explanation text is part of the static layer"""
+    return Template(
+        name=treaty_type,
+        fixed=(
+            Text(treaty_type.upper(), CENTER, 50, 'title'),
+            *_HEADER,
+            Text("Wird folgender Vertrag geschlossen:", 50, 370, 'header'),
+        ),
+        flow_start=440,
+        flow=(
+            Paragraph(TREATY_EXPLANATIONS.get(treaty_type, ""), 70, 'content', line_height=35),
+            Spacer(20),
+            FlowText("Vertragsdauer: {expiry_date}", 70),
+            Section("Vertragsbruch-Klausel:", 'vertragsbruch_klausel', gap=50),
+            Section("Anmerkungen:", 'anmerkungen', gap=30),
+            Signatures("Unterzeichnet am {signing_date}", gap=50),
+        ),
+    )
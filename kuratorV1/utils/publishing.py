@@ -0,0 +1,50 @@
+import io
+import logging
+import discord
+from utils.image_generator import page_filenames
+
+logger = logging.getLogger('discord_bot')
+
+def archive_channel(bot, channel_id):
+    """Return the configured archive channel, or None if unset or unknown"""
+    if not channel_id:
+        return None
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        logger.warning(f"Archiv-Channel {channel_id} nicht gefunden, Dokumente gehen direkt an die Empfänger")
+    return channel
+
+def document_files(pages, filename):
+    """discord.File objects for the encoded pages of a document"""
+    if isinstance(pages, bytes):
+        pages = (pages,)
+    return [
+        discord.File(fp=io.BytesIO(page), filename=name)
+        for page, name in zip(pages, page_filenames(len(pages), filename))
+    ]
+
+async def _upload(destination, content, pages, filename):
+    message = await destination.send(content, files=document_files(pages, filename))
+    return message.jump_url
+
+async def publish_document(pages, filename, recipients, archive=None, archive_content=None):
+    """
+    Verteilt ein fertig kodiertes Dokument (eine oder mehrere Seiten) an das Archiv und alle Empfänger.
+
+    recipients ist eine Liste von (Ziel, Nachricht)-Paaren. Jeder bekommt die Dateien selbst: Anhang-URLs
+    von Discord sind signiert und laufen ab, ein Verweis darauf wäre keine dauerhafte Kopie. Gerendert und
+    kodiert wird trotzdem nur einmal, die Seiten werden nicht kopiert. Gibt die Links zu den gesendeten
+    Nachrichten zurück.
+    """
+    links = []
+    if archive is not None:
+        try:
+            links.append(await _upload(archive, archive_content, pages, filename))
+        except discord.HTTPException as e:
+            logger.warning(f"Upload von {filename} ins Archiv fehlgeschlagen: {e}")
+    for destination, content in recipients:
+        try:
+            links.append(await _upload(destination, content, pages, filename))
+        except discord.HTTPException as e:
+            logger.warning(f"{filename} konnte nicht an {destination} gesendet werden: {e}")
+    return links
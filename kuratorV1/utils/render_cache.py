@@ -0,0 +1,70 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    """
+    LRU-Cache für fertig kodierte Vertragsbilder (ein Tupel von Seiten), adressiert über einen
+    Hash der Vertragsfelder.
+    Die Größe ist in Bytes begrenzt; die am längsten nicht genutzten Bilder fliegen zuerst raus.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, fields):
+        """Return the content address of a document of the given kind"""
+        payload = json.dumps({"kind": kind, "fields": fields}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _size_of(data):
+        return sum(len(page) for page in data) if isinstance(data, (tuple, list)) else len(data)
+
+    def get(self, key):
+        """Return the cached bytes for key, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store data under key and evict least recently used entries beyond max_bytes"""
+        size = self._size_of(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._size_of(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= self._size_of(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss counters and the current fill level"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
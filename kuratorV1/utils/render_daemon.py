@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import struct
+import config
+from utils.render_stats import render_stats
+
+logger = logging.getLogger('discord_bot')
+
+# Jede Nachricht: 4 Byte Länge (big-endian) + JSON-Kopf, danach die Seiten als Rohbytes
+_LENGTH = struct.Struct('>I')
+MAX_HEADER_BYTES = 1024 * 1024
+
+async def _read_message(reader):
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if length > MAX_HEADER_BYTES:
+        raise ValueError(f"Nachrichtenkopf zu groß: {length} Bytes")
+    return json.loads(await reader.readexactly(length))
+
+def _write_message(writer, header, pages=()):
+    data = json.dumps(header).encode()
+    writer.write(_LENGTH.pack(len(data)) + data)
+    for page in pages:
+        writer.write(page)
+
+class RenderClient:
+    """
+    Verbindung eines Bot-Prozesses zum lokalen Render-Daemon. Ist der Daemon nicht erreichbar
+    oder ausgelastet, liefert render() None und der Aufrufer rendert selbst.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.timeout = timeout
+        self._available = None
+
+    async def _request(self, header):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            _write_message(writer, header)
+            await writer.drain()
+            reply = await _read_message(reader)
+            pages = tuple([await reader.readexactly(size) for size in reply.get("pages", ())])
+            return reply, pages
+        finally:
+            writer.close()
+
+    def _mark(self, available, reason=None):
+        # Only log state changes, not every render while the daemon is down
+        if available != self._available:
+            if available:
+                logger.info(f"Render daemon at {self.path} available")
+            else:
+                logger.warning(f"Render daemon at {self.path} unavailable, rendering in-process: {reason}")
+        self._available = available
+
+    async def render(self, kind, fields):
+        """Encoded pages from the daemon, None if it is absent or busy; raises RuntimeError if the render failed"""
+        try:
+            reply, pages = await asyncio.wait_for(
+                self._request({"op": "render", "kind": kind, "fields": fields}), self.timeout
+            )
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            self._mark(False, e)
+            return None
+        self._mark(True)
+        if reply["ok"]:
+            return pages
+        if reply.get("busy"):
+            logger.info(f"Render daemon busy ({reply.get('queue_depth')} queued), rendering {kind} in-process")
+            return None
+        raise RuntimeError(f"Render daemon: {reply.get('error')}")
+
+    async def stats(self):
+        """Queue depth, cache and stage statistics of the daemon, None if it is not reachable"""
+        try:
+            reply, _ = await asyncio.wait_for(self._request({"op": "stats"}), self.timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            self._mark(False, e)
+            return None
+        self._mark(True)
+        return reply["stats"]
+
+class RenderDaemon:
+    """
+    Lokaler Render-Server: nimmt Vertragsdaten über einen Unix-Socket an und antwortet mit den
+    kodierten Seiten. Alle Bot-Prozesse teilen sich so Worker, Pergament-Pools, Siegel und Render-Cache.
+    Stehen schon backlog Aufträge an, wird sofort mit "busy" geantwortet (Gegendruck statt Stau).
+    """
+
+    def __init__(self, path, renderer, backlog):
+        self.path = path
+        self.renderer = renderer
+        self.backlog = backlog
+        self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await _read_message(reader)
+            if request.get("op") == "stats":
+                _write_message(writer, {"ok": True, "stats": self.stats()})
+            elif request.get("op") == "render":
+                await self._render(request, writer)
+            else:
+                _write_message(writer, {"ok": False, "error": f"unknown op {request.get('op')!r}"})
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.warning(f"Render daemon: invalid request: {e}")
+        finally:
+            writer.close()
+
+    async def _render(self, request, writer):
+        depth = self.renderer.queue_depth()
+        if depth >= self.backlog:
+            _write_message(writer, {"ok": False, "busy": True, "queue_depth": depth})
+            return
+        try:
+            pages = await self.renderer.render(request["kind"], **request["fields"])
+        except Exception as e:
+            logger.error(f"Render daemon: {request.get('kind')} failed: {e}")
+            _write_message(writer, {"ok": False, "error": str(e)})
+            return
+        _write_message(writer, {"ok": True, "pages": [len(page) for page in pages]}, pages)
+
+    def stats(self):
+        return {
+            "queue_depth": self.renderer.queue_depth(),
+            "backlog": self.backlog,
+            "workers": self.renderer.workers,
+            "render_cache": self.renderer.cache.stats(),
+            "render_stages": render_stats.snapshot(),
+        }
+
+    async def serve(self):
+        """Start the workers and serve until cancelled"""
+        await self.renderer.wait_ready()
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket of a previous run
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o660)
+        logger.info(f"Render daemon listening on {self.path} ({self.renderer.workers} workers, backlog {self.backlog})")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.renderer.shutdown()
+
+async def _main():
+    # The daemon renders with its own local pool, never through a client to itself
+    from utils.renderer import ContractRenderer, render_cache
+    renderer = ContractRenderer(config.RENDER_WORKERS, config.RENDER_QUEUE_SIZE, render_cache)
+    daemon = RenderDaemon(config.RENDER_DAEMON_SOCKET or 'render.sock', renderer, config.RENDER_DAEMON_BACKLOG)
+    task = asyncio.ensure_future(daemon.serve())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        logger.info("Render daemon stopped")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(_main())
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import config
+
+logger = logging.getLogger('discord_bot')
+
+_current = ContextVar('render_profile', default=None)
+_NULL = nullcontext()
+_hooks = []
+
+class StageTimer:
+    """
+    Sammelt die Zeiten der Render-Stufen eines Dokuments. Verschachtelte Stufen werden
+    exklusiv gezählt (z.B. Schrift laden innerhalb von Text zeichnen).
+    """
+
+    def __init__(self, kind, memory=False):
+        self.kind = kind
+        self.memory = memory
+        self.stages = {}
+        self.peaks = {}
+        self._stack = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        top_level = not self._stack
+        if self.memory and top_level:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - children
+            if self._stack:
+                self._stack[-1] += elapsed
+            if self.memory and top_level:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+
+    def record(self):
+        """The collected timings as a plain dict (picklable, so workers can send it back)"""
+        record = {
+            "kind": self.kind,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+        }
+        if self.memory:
+            record["peak_kib"] = {name: round(peak / 1024, 1) for name, peak in self.peaks.items()}
+        return record
+
+def enabled():
+    return config.RENDER_PROFILING in ('timing', 'memory')
+
+@contextmanager
+def profile_document(kind, emit=True):
+    """
+    Profile one document render. Yields the StageTimer, or None when profiling is off.
+    With emit=False the caller is responsible for passing timer.record() to emit_record()
+    (render workers send it back to the bot process instead). Inside an already profiled
+    document the outer timer is reused.
+    """
+    outer = _current.get()
+    if outer is not None or not enabled():
+        yield outer
+        return
+    memory = config.RENDER_PROFILING == 'memory'
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    timer = StageTimer(kind, memory)
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+    if emit:
+        emit_record(timer.record())
+
+def stage(name):
+    """Context manager timing a render stage; a shared no-op when no document is being profiled"""
+    timer = _current.get()
+    return _NULL if timer is None else timer.stage(name)
+
+def add_hook(hook):
+    """Register a callable that receives every finished record"""
+    _hooks.append(hook)
+
+def emit_record(record):
+    """Pass a record to all hooks; a failing hook must not break rendering"""
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            logger.warning(f"Render-Profiling-Hook {hook!r} fehlgeschlagen: {e}")
+
+def log_record(record):
+    stages = ", ".join(f"{name} {ms:.1f}" for name, ms in record["stages_ms"].items())
+    logger.info(f"Render {record['kind']}: {record['total_ms']:.1f} ms ({stages})")
+
+class RollingStats:
+    """Rolling percentiles per stage over the last `window` documents"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._peaks = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record):
+        with self._lock:
+            samples = dict(record["stages_ms"], total=record["total_ms"])
+            for name, ms in samples.items():
+                self._samples.setdefault(name, deque(maxlen=self.window)).append(ms)
+            for name, kib in record.get("peak_kib", {}).items():
+                self._peaks.setdefault(name, deque(maxlen=self.window)).append(kib)
+
+    @staticmethod
+    def _percentiles(values):
+        ordered = sorted(values)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"count": len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": ordered[-1]}
+
+    def snapshot(self):
+        """Percentiles of stage times in ms (and peak allocations in KiB, if recorded)"""
+        with self._lock:
+            return {
+                "enabled": enabled(),
+                "mode": config.RENDER_PROFILING,
+                "stages_ms": {name: self._percentiles(values) for name, values in self._samples.items()},
+                "peak_kib": {name: self._percentiles(values) for name, values in self._peaks.items()},
+            }
+
+render_stats = RollingStats(config.RENDER_STATS_WINDOW)
+
+add_hook(log_record)
+add_hook(render_stats.observe)
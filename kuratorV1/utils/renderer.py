@@ -0,0 +1,386 @@
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import time
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import config
+from utils import image_generator, render_stats
+from utils.fonts import font_registry
+from utils.render_daemon import RenderClient
+from utils.layout import FONT_FACE, FONT_SIZES
+from utils.render_cache import RenderCache
+
+logger = logging.getLogger('discord_bot')
+
+def _init_worker(warm_up):
+    """Prepare a render worker process: logging, fonts and its own parchment pools"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    sizes = {round(size * tier.scale) for tier in image_generator.RENDER_TIERS.values() for size in FONT_SIZES.values()}
+    font_registry.preload(FONT_FACE, sizes)
+    if warm_up:
+        for pool in image_generator.background_pools.values():
+            pool.warm_up()
+
+def _ping():
+    return True
+
+def _profiled(kind, generator, fields):
+    """Render in the worker; the stage timings (or None) travel back with the pages"""
+    with render_stats.profile_document(kind, emit=False) as timer:
+        pages = tuple(page.getvalue() for page in generator(**fields, pages=True))
+    return pages, timer.record() if timer is not None else None
+
+def _render_trade_pages(fields):
+    return _profiled('trade', image_generator.generate_trade_agreement_image, fields)
+
+def _render_treaty_pages(fields):
+    return _profiled('treaty', image_generator.generate_treaty_image, fields)
+
+@dataclass(frozen=True)
+class ContractSpec:
+    """Ein Vertrag für render_batch: Art ('trade' oder 'treaty'), Dateiname ohne Endung und Generator-Argumente"""
+    kind: str
+    name: str
+    kwargs: dict = field(default_factory=dict)
+
+# Pro Art: Generator (für die Signatur), Worker-Funktion und das Datumsfeld, das beim Rendern feststeht
+_KINDS = {
+    'trade': (image_generator.generate_trade_agreement_image, _render_trade_pages, 'timestamp', "%d.%m.%Y, %H:%M Uhr"),
+    'treaty': (image_generator.generate_treaty_image, _render_treaty_pages, 'signing_date', "%d.%m.%Y"),
+}
+
+def _normalize(func, args, kwargs):
+    """Bind the call to func's signature so equivalent calls yield identical fields"""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    fields = dict(bound.arguments)
+    fields.pop('pages', None)
+    for name in ('vertragsbruch_klausel', 'anmerkungen'):
+        fields[name] = fields[name] or ""
+    return fields
+
+def _profile(kwargs):
+    """Output profile a render with these arguments is encoded with"""
+    quality = kwargs.get('quality', 'full')
+    return kwargs.get('output_profile') or image_generator.RENDER_TIERS[quality].output_profile
+
+@dataclass(frozen=True)
+class QualityLevel:
+    """Stufe der adaptiven Qualität: ab welcher Warteschlange oder Latenz sie greift und was sie am Auftrag ändert"""
+    name: str
+    queue_depth: int
+    latency_ms: float
+    quality: str = None
+    output_profile: str = None
+
+class AdaptiveQuality:
+    """
+    Setzt die Qualität voller Dokumente unter Last stufenweise herab. Gemessen werden die Warteschlange
+    und eine gleitende mittlere Renderzeit; eine Stufe höher geht es sofort, zurück erst nach cooldown
+    Sekunden ohne diese Last, eine Stufe nach der anderen.
+    """
+
+    def __init__(self, levels, cooldown, smoothing=0.2):
+        self.levels = levels
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.level = 0
+        self.latency_ms = 0.0
+        self._calm_since = None
+        self.counts = [0] * len(levels)
+
+    def observe(self, latency_ms):
+        """Feed the duration of a finished render into the moving average"""
+        self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+
+    def update(self, queue_depth):
+        """Re-evaluate the level for the current load and return it"""
+        target = 0
+        for index, level in enumerate(self.levels[1:], 1):
+            if queue_depth >= level.queue_depth or self.latency_ms >= level.latency_ms:
+                target = index
+        now = time.monotonic()
+        if target > self.level:
+            self._set(target, queue_depth)
+            self._calm_since = None
+        elif target < self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self._set(self.level - 1, queue_depth)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _set(self, level, queue_depth):
+        logger.warning(
+            f"Render quality {self.levels[self.level].name} -> {self.levels[level].name} "
+            f"(queue {queue_depth}, latency {self.latency_ms:.0f} ms)"
+        )
+        self.level = level
+
+    def apply(self, kwargs, queue_depth):
+        """Arguments for a render at the current level; previews and vector output stay as requested"""
+        level = self.levels[self.update(queue_depth)]
+        if kwargs.get('quality', 'full') != 'full' or image_generator.OUTPUT_PROFILES[_profile(kwargs)].format in image_generator.VECTOR_FORMATS:
+            return kwargs
+        self.counts[self.level] += 1
+        changes = {name: value for name, value in (('quality', level.quality), ('output_profile', level.output_profile)) if value}
+        return dict(kwargs, **changes)
+
+    def stats(self):
+        return {
+            "level": self.levels[self.level].name,
+            "latency_ms": round(self.latency_ms, 1),
+            "renders_per_level": {level.name: count for level, count in zip(self.levels, self.counts)},
+        }
+
+class ContractRenderer:
+    """
+    Rendert Vertragsbilder in einem Prozesspool, damit der Event-Loop des Bots nicht blockiert.
+    Höchstens max_queue Aufträge sind gleichzeitig unterwegs, weitere warten auf einen freien Platz.
+    """
+
+    def __init__(self, workers, max_queue, cache, warm_up=True, daemon=None, adaptive=None):
+        self.workers = max(1, workers)
+        self.max_queue = max(self.workers, max_queue)
+        self.cache = cache
+        self.warm_up = warm_up
+        self.daemon = daemon
+        self.adaptive = adaptive
+        self._executor = None
+        self._slots = None
+        self._pending = 0
+        self._batch_pending = 0
+        self._inflight = {}
+
+    def start(self):
+        """Create the worker pool (idempotent)"""
+        if self._executor is None:
+            # spawn instead of fork: the bot process runs the gateway and Flask in threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.warm_up,)
+            )
+            logger.info(f"Render pool started: {self.workers} workers, queue limit {self.max_queue}")
+
+    async def wait_ready(self):
+        """Wait until the worker processes are up and have warmed their parchment pools"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)
+        ))
+
+    async def _submit(self, func, *args, batch=False):
+        self.start()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_queue)
+        self._pending += 1
+        self._batch_pending += batch
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            self._batch_pending -= batch
+
+    async def _run(self, kind, func, fields, batch=False):
+        """Render via the daemon if one is running, otherwise in a local worker"""
+        started = time.perf_counter()
+        pages = None
+        if self.daemon is not None:
+            pages = await self.daemon.render(kind, fields)
+        if pages is None:
+            pages, record = await self._submit(func, fields, batch=batch)
+            if record is not None:
+                render_stats.emit_record(record)
+        # Exports are not what users wait for; their renders must not lower the quality of interactive ones
+        if self.adaptive is not None and not batch:
+            self.adaptive.observe((time.perf_counter() - started) * 1000)
+        return pages
+
+    async def _render(self, kind, func, fields):
+        """
+        Return cached pages for identical documents, otherwise render once and cache.
+        Only a document that still has to be rendered is adapted to the current load level.
+        """
+        key = self.cache.key(kind, fields)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        # Identical documents requested while the first one is still rendering share its result
+        future = self._inflight.get(key)
+        if future is None and self.adaptive is not None:
+            # Outstanding documents also count while they are still on their way to a worker or the daemon
+            adapted = self.adaptive.apply(fields, max(self.interactive_depth(), len(self._inflight)))
+            if adapted != fields:
+                fields, key = adapted, self.cache.key(kind, adapted)
+                data = self.cache.get(key)
+                if data is not None:
+                    return data
+                future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(kind, func, fields))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._store(key, done))
+        return await asyncio.shield(future)
+
+    def _store(self, key, future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    @staticmethod
+    def _prepare(kind, args, kwargs):
+        """Normalized fields for a render; the date is fixed here so the cache key covers it"""
+        generator, func, date_field, date_format = _KINDS[kind]
+        fields = _normalize(generator, args, kwargs)
+        if fields[date_field] is None:
+            fields[date_field] = datetime.now().strftime(date_format)
+        return func, fields
+
+    async def render(self, kind, *args, **kwargs):
+        """Render a document of the given kind ('trade' or 'treaty') and return the encoded pages"""
+        func, fields = self._prepare(kind, args, kwargs)
+        return await self._render(kind, func, fields)
+
+    async def render_trade(self, *args, **kwargs):
+        """Render a trade agreement (arguments as generate_trade_agreement_image) and return the encoded pages"""
+        return await self.render('trade', *args, **kwargs)
+
+    async def render_treaty(self, *args, **kwargs):
+        """Render a treaty (arguments as generate_treaty_image) and return the encoded pages"""
+        return await self.render('treaty', *args, **kwargs)
+
+    async def use_daemon(self):
+        """True if a render daemon is configured and answering; local workers are then only a fallback"""
+        return self.daemon is not None and await self.daemon.stats() is not None
+
+    async def render_batch(self, specs, window=None):
+        """
+        Render many ContractSpecs over the worker pool and yield (spec, pages) in completion order.
+        At most window renders (default: two per worker) are in flight, so memory stays bounded
+        and interactive renders still find free slots. Results bypass the render cache so an
+        export does not evict the documents of running negotiations. Failed renders yield
+        (spec, None).
+        """
+        window = window or self.workers * 2
+        specs = iter(specs)
+        running = {}
+
+        def launch():
+            for spec in specs:
+                try:
+                    func, fields = self._prepare(spec.kind, (), spec.kwargs)
+                    task = asyncio.ensure_future(self._run(spec.kind, func, fields, batch=True))
+                except (KeyError, TypeError) as e:
+                    # Invalid spec: report it like a failed render instead of aborting the batch
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_exception(e)
+                running[task] = spec
+                if len(running) >= window:
+                    return
+
+        try:
+            launch()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    spec = running.pop(task)
+                    if task.exception() is not None:
+                        logger.error(f"Batch render of {spec.name} failed: {task.exception()}")
+                        yield spec, None
+                    else:
+                        yield spec, task.result()
+                launch()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def write_zip(self, specs, fp, progress=None, window=None):
+        """
+        Render specs with render_batch and write the pages straight into a ZIP archive on fp.
+        progress is an optional coroutine function called with (done, total).
+        Returns the number of documents written and failed.
+        """
+        specs = list(specs)
+        written = failed = 0
+        # PNG/WebP are already compressed, deflating them again only costs CPU
+        with zipfile.ZipFile(fp, 'w', compression=zipfile.ZIP_STORED) as archive:
+            async for spec, pages in self.render_batch(specs, window):
+                if pages is None:
+                    failed += 1
+                else:
+                    filename = image_generator.output_filename(spec.name, _profile(spec.kwargs))
+                    for page, name in zip(pages, image_generator.page_filenames(len(pages), filename)):
+                        archive.writestr(name, page)
+                    written += 1
+                if progress is not None:
+                    await progress(written + failed, len(specs))
+        return written, failed
+
+    def queue_depth(self):
+        """Number of local renders that are running or waiting for a slot"""
+        return self._pending
+
+    def interactive_depth(self):
+        """Queued local renders without those of running exports (what adaptive quality reacts to)"""
+        return self._pending - self._batch_pending
+
+    def load_stats(self):
+        """Queue depth and, with adaptive quality, the current level and average latency"""
+        stats = {"queue_depth": self.queue_depth()}
+        if self.adaptive is not None:
+            stats.update(self.adaptive.stats())
+        return stats
+
+    async def daemon_stats(self):
+        """Statistics of the render daemon, None without one"""
+        return await self.daemon.stats() if self.daemon is not None else None
+
+    def shutdown(self):
+        """Stop the worker processes, dropping renders that have not started yet"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Render pool stopped")
+
+render_cache = RenderCache(config.RENDER_CACHE_MAX_BYTES)
+
+# Stufen der adaptiven Qualität, von voll bis Vorschau
+QUALITY_LEVELS = (
+    QualityLevel("full", 0, 0),
+    QualityLevel("fast_encode", config.RENDER_REDUCED_QUEUE, config.RENDER_REDUCED_LATENCY_MS, output_profile="png_fast"),
+    QualityLevel("preview", config.RENDER_PREVIEW_QUEUE, config.RENDER_PREVIEW_LATENCY_MS, quality="preview", output_profile="png_fast"),
+)
+
+renderer = ContractRenderer(
+    config.RENDER_WORKERS,
+    config.RENDER_QUEUE_SIZE,
+    render_cache,
+    warm_up=config.PARCHMENT_POOL_WARMUP != 'lazy',
+    daemon=RenderClient(config.RENDER_DAEMON_SOCKET, config.RENDER_DAEMON_TIMEOUT) if config.RENDER_DAEMON_SOCKET else None,
+    adaptive=AdaptiveQuality(QUALITY_LEVELS, config.RENDER_ADAPTIVE_COOLDOWN) if config.RENDER_ADAPTIVE_QUALITY else None
+)
+
+async def render_trade(*args, **kwargs):
+    return await renderer.render_trade(*args, **kwargs)
+
+async def render_treaty(*args, **kwargs):
+    return await renderer.render_treaty(*args, **kwargs)
+
+async def write_zip(specs, fp, progress=None):
+    return await renderer.write_zip(specs, fp, progress)
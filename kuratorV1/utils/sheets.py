@@ -1,66 +1,150 @@
 import os
 import json
-from datetime import datetime
+import asyncio
+import functools
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import config
+import httplib2
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp, Request
 from googleapiclient.discovery import build
+from utils.sheets_outbox import SheetsOutbox
+
+logger = logging.getLogger('discord_bot')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# Der Google-Client blockiert; seine Aufrufe laufen in einem eigenen, begrenzten Thread-Pool
+_executor = ThreadPoolExecutor(max_workers=config.SHEETS_WORKERS, thread_name_prefix='sheets')
+
+def load_credentials():
+    """Read the service account credentials from the JSON file or GOOGLE_SERVICE_ACCOUNT, None if there are none"""
+    # Check if we have a JSON file or a direct service account info in env var
+    if os.path.exists('empire-service-account.json'):
+        return service_account.Credentials.from_service_account_file('empire-service-account.json', scopes=SCOPES)
+    if os.environ.get('GOOGLE_SERVICE_ACCOUNT'):
+        service_account_info = json.loads(os.environ.get('GOOGLE_SERVICE_ACCOUNT'))
+        return service_account.Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+    print("No Google service account credentials found")
+    return None
+
+def build_sheets_service(credentials):
+    """Build a Sheets service from the bundled discovery document (no network round trip)"""
+    return build('sheets', 'v4', credentials=credentials, cache_discovery=False, static_discovery=True)
+
+class SheetsClient:
+    """
+    Prozessweiter Sheets-Client: Zugangsdaten und Service werden einmal geladen, das Access-Token
+    wird vor Ablauf erneuert, und jeder Thread des Sheets-Pools hält seine eigene Keep-Alive-Verbindung
+    (httplib2 ist nicht threadsicher, der Service selbst wird geteilt).
+    """
+
+    def __init__(self, timeout=None, refresh_margin=300):
+        self.timeout = timeout
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._service = None
+        self._local = threading.local()
+
+    def service(self):
+        """The shared service, built on first use; None without credentials"""
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    credentials = load_credentials()
+                    if credentials is None:
+                        return None
+                    self._service = build_sheets_service(credentials)
+                    self._credentials = credentials
+        return self._service
+
+    def _http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=self.timeout))
+            self._local.http = http
+        return http
+
+    def _refresh_token(self):
+        """Fetch a new access token shortly before the current one expires, once for all threads"""
+        with self._lock:
+            expiry = self._credentials.expiry
+            # google-auth stores expiry as naive UTC
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if self._credentials.token is None or expiry is None or expiry - now < self.refresh_margin:
+                self._credentials.refresh(Request(self._http().http))
+
+    def append(self, spreadsheet_id, range_name, rows):
+        """Append rows to range_name; returns the API response, or None without credentials"""
+        service = self.service()
+        if service is None:
+            return None
+        self._refresh_token()
+        return service.spreadsheets().values().append(
+            spreadsheetId=spreadsheet_id,
+            range=range_name,
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            body={'values': rows}
+        ).execute(http=self._http())
+
+sheets_client = SheetsClient(timeout=config.SHEETS_TIMEOUT)
 
 def get_sheets_service():
-    """Create and return a Google Sheets service object"""
+    """Return the shared Google Sheets service object (built once per process)"""
     try:
-        # Check if we have a JSON file or a direct service account info in env var
-        if os.path.exists('empire-service-account.json'):
-            credentials = service_account.Credentials.from_service_account_file(
-                'empire-service-account.json', 
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-        elif os.environ.get('GOOGLE_SERVICE_ACCOUNT'):
-            service_account_info = json.loads(os.environ.get('GOOGLE_SERVICE_ACCOUNT'))
-            credentials = service_account.Credentials.from_service_account_info(
-                service_account_info,
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-        else:
-            print("No Google service account credentials found")
-            return None
-            
-        return build('sheets', 'v4', credentials=credentials)
+        return sheets_client.service()
     except Exception as e:
         print(f"Error setting up Google Sheets service: {e}")
         return None
 
+TRADE_RANGE = 'Handelsverträge!A:E'
+AUSBAU_RANGE = 'Ausbau!A:F'
+
+def trade_row(initiator_country, partner_country, offer_resource, offer_amount, request_resource, request_amount):
+    """Row of the trade ledger for an accepted trade"""
+    return [
+        datetime.now().strftime('%d.%m.%Y'),
+        initiator_country,
+        partner_country,
+        f"{offer_resource} ({offer_amount})",
+        f"{request_resource} ({request_amount})"
+    ]
+
+def ausbau_row(land, ausbau_art, level, kosten, gebiet, anzahl=1):
+    """Row of the development ledger; kosten maps resources to amounts, zero amounts are left out"""
+    kosten_str = ", ".join([f"{k.capitalize()}: {v}" for k, v in kosten.items() if v > 0])
+    return [
+        datetime.now().strftime('%d.%m.%Y'),
+        land,
+        f"{ausbau_art} (Stufe {level})",
+        kosten_str,
+        f"Gebiet {gebiet}",
+        anzahl if anzahl > 1 else ""
+    ]
+
 def log_trade_to_sheet(spreadsheet_id, initiator_country, partner_country, 
                       offer_resource, offer_amount, request_resource, request_amount):
     """Log a trade agreement to the spreadsheet"""
     try:
         # Always use the actual trade sheet ID from environment variable
         spreadsheet_id = os.environ.get('TRADE_SHEET_ID', spreadsheet_id)
+        row_data = trade_row(initiator_country, partner_country, offer_resource, offer_amount, request_resource, request_amount)
         
-        service = get_sheets_service()
-        if not service:
-            return False
-            
-        # Format date
-        date = datetime.now().strftime('%d.%m.%Y')
-        
-        # Prepare row data
-        row_data = [
-            date,
-            initiator_country,
-            partner_country,
-            f"{offer_resource} ({offer_amount})",
-            f"{request_resource} ({request_amount})"
-        ]
-        
-        # Append row to spreadsheet
-        result = service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range='Handelsverträge!A:E',
-            valueInputOption='USER_ENTERED',
-            insertDataOption='INSERT_ROWS',
-            body={'values': [row_data]}
-        ).execute()
+        # Append row to spreadsheet over the shared client
+        result = sheets_client.append(spreadsheet_id, TRADE_RANGE, [row_data])
         
-        return True
+        return result is not None
     except Exception as e:
         print(f"Error logging trade to sheet: {e}")
         return False
@@ -82,37 +166,259 @@ def log_ausbau_to_sheet(spreadsheet_id, land, ausbau_art, level, kosten, gebiet,
     try:
         # Always use the actual trade sheet ID from environment variable
         spreadsheet_id = os.environ.get('TRADE_SHEET_ID', spreadsheet_id)
+        row_data = ausbau_row(land, ausbau_art, level, kosten, gebiet, anzahl)
         
-        service = get_sheets_service()
-        if not service:
-            return False
-            
-        # Format date
-        date = datetime.now().strftime('%d.%m.%Y')
-        
-        # Format costs
-        kosten_str = ", ".join([f"{k.capitalize()}: {v}" for k, v in kosten.items() if v > 0])
-        
-        # Prepare row data
-        row_data = [
-            date,
-            land,
-            f"{ausbau_art} (Stufe {level})",
-            kosten_str,
-            f"Gebiet {gebiet}",
-            anzahl if anzahl > 1 else ""
-        ]
+        # Append row to spreadsheet over the shared client
+        result = sheets_client.append(spreadsheet_id, AUSBAU_RANGE, [row_data])
         
-        # Append row to spreadsheet
-        result = service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range='Ausbau!A:F',
-            valueInputOption='USER_ENTERED',
-            insertDataOption='INSERT_ROWS',
-            body={'values': [row_data]}
-        ).execute()
-        
-        return True
+        return result is not None
     except Exception as e:
         print(f"Error logging development to sheet: {e}")
-        return False
\ No newline at end of file
+        return False
+
+async def _run_in_pool(func, *args):
+    """Run a blocking Sheets call in the Sheets thread pool; False if it fails or exceeds SHEETS_TIMEOUT"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_executor, functools.partial(func, *args)), config.SHEETS_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        # The thread keeps waiting for Google, but the caller (and the event loop) moves on
+        logger.warning(f"Sheets-Aufruf {func.__name__} nach {config.SHEETS_TIMEOUT}s abgebrochen")
+        return False
+
+def _summary(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max": ordered[-1],
+    }
+
+class SheetsWriteQueue:
+    """
+    Write-behind-Puffer für Tabellenzeilen: Zeilen werden je Tabellenbereich gesammelt und alle
+    interval Sekunden (oder sobald max_rows warten) mit einem einzigen mehrzeiligen append geschrieben.
+    Mit outbox (oder outbox_path, erst beim Start geöffnet) wird jede Zeile vorher lokal festgeschrieben;
+    nicht zugestellte Zeilen spielt der Hintergrund-Task alle replay_interval Sekunden erneut ein,
+    auch nach einem Neustart.
+    add() gibt ein Future zurück, das nach dem Schreiben True oder False liefert; wer nicht wartet,
+    schreibt fire-and-forget.
+    """
+
+    def __init__(self, client, interval, max_rows, outbox=None, outbox_path=None, replay_interval=60, retention_days=30):
+        self.client = client
+        self.interval = interval
+        self.max_rows = max_rows
+        self.outbox = outbox
+        self.outbox_path = outbox_path
+        self.replay_interval = replay_interval
+        self.retention_days = retention_days
+        self._pending = {}
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._task = None
+        self._wakeup = None
+        self._last_replay = 0.0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self._batch_sizes = deque(maxlen=500)
+        self._flush_ms = deque(maxlen=500)
+
+    def start(self):
+        """Open the outbox and start the flush/replay task on the running loop (idempotent)"""
+        if self.outbox is None and self.outbox_path:
+            # Opened here rather than at import, so processes that only read stats never create the file
+            self.outbox = _open_outbox(self.outbox_path)
+            self.outbox_path = None
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _enqueue(self, key, row_id, row, future):
+        with self._lock:
+            batch = self._pending.setdefault(key, [])
+            batch.append((row_id, row, future))
+            self._queued.add(row_id)
+            return len(batch) >= self.max_rows
+
+    def add(self, spreadsheet_id, range_name, row, row_id=None):
+        """
+        Queue a row for range_name; returns a future resolving to True once written.
+        A row_id that is already journaled is not written again; its future resolves at once
+        to whether it has been delivered.
+        """
+        future = asyncio.get_running_loop().create_future()
+        row_id = row_id or f"row:{uuid.uuid4()}"
+        self.start()
+        if self.outbox is not None and not self.outbox.put(row_id, spreadsheet_id, range_name, row):
+            future.set_result(self.outbox.is_delivered(row_id))
+            return future
+        full = self._enqueue((spreadsheet_id, range_name), row_id, row, future)
+        if full:
+            self._wakeup.set()
+        return future
+
+    def replay(self):
+        """Queue journaled rows that are neither delivered nor already waiting in memory"""
+        self._last_replay = time.monotonic()
+        if self.outbox is None:
+            return
+        replayed = 0
+        for row_id, spreadsheet_id, range_name, row in self.outbox.pending():
+            if row_id not in self._queued:
+                self._enqueue((spreadsheet_id, range_name), row_id, row, None)
+                replayed += 1
+        if replayed:
+            logger.info(f"Sheets-Outbox: {replayed} ausstehende Zeilen werden erneut geschrieben")
+        self.outbox.prune(self.retention_days)
+
+    async def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_replay >= self.replay_interval:
+                    self.replay()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # One failed round (e.g. a locked outbox) must not stop flushing for good
+                logger.exception("Sheets-Warteschlange: Fehler beim Schreiben oder Wiedereinspielen")
+                await asyncio.sleep(self.interval)
+
+    def _take(self):
+        with self._lock:
+            batches, self._pending = self._pending, {}
+        return batches
+
+    def _append(self, key, rows):
+        spreadsheet_id, range_name = key
+        try:
+            return self.client.append(spreadsheet_id, range_name, rows) is not None
+        except Exception as e:
+            logger.error(f"Sheets: {len(rows)} Zeilen für {range_name} konnten nicht geschrieben werden: {e}")
+            return False
+
+    def _finish(self, items, ok, elapsed_ms):
+        row_ids = [row_id for row_id, _, _ in items]
+        if self.outbox is not None:
+            # Undelivered rows stay in the journal and come back with the next replay
+            (self.outbox.mark_delivered if ok else self.outbox.mark_failed)(row_ids)
+        with self._lock:
+            self._queued.difference_update(row_ids)
+        self.flushes += 1
+        self._batch_sizes.append(len(items))
+        self._flush_ms.append(round(elapsed_ms, 1))
+        if ok:
+            self.flushed_rows += len(items)
+        else:
+            self.failed_rows += len(items)
+
+    def _deliver(self, key, items):
+        """Append one batch and record the real outcome; runs in a Sheets pool thread"""
+        start = time.perf_counter()
+        ok = self._append(key, [row for _, row, _ in items])
+        self._finish(items, ok, (time.perf_counter() - start) * 1000)
+        return ok
+
+    async def _flush_batch(self, key, items):
+        # No wait_for here: the rows stay queued until the thread returns, otherwise a slow append
+        # that still succeeds would be replayed and land in the sheet twice. The HTTP timeout of
+        # the client bounds the call.
+        loop = asyncio.get_running_loop()
+        ok = await loop.run_in_executor(_executor, self._deliver, key, items)
+        for _, _, future in items:
+            if future is not None and not future.done():
+                future.set_result(ok)
+
+    async def flush(self):
+        """Write all waiting rows now, one append per range"""
+        batches = self._take()
+        await asyncio.gather(*(self._flush_batch(key, items) for key, items in batches.items()))
+
+    def flush_sync(self):
+        """Write all waiting rows from the calling thread (on shutdown, when the event loop is gone)"""
+        for key, items in self._take().items():
+            self._deliver(key, items)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(len(batch) for batch in self._pending.values())
+        return {
+            "pending_rows": pending,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "batch_size": _summary(self._batch_sizes),
+            "flush_ms": _summary(self._flush_ms),
+            "outbox": self.outbox.stats() if self.outbox is not None else None,
+        }
+
+def _outbox_path():
+    """SHEETS_OUTBOX resolved against the project directory, None if the outbox is disabled"""
+    path = config.SHEETS_OUTBOX
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+def _open_outbox(path):
+    try:
+        return SheetsOutbox(path)
+    except sqlite3.Error as e:
+        logger.error(f"Sheets-Outbox {path} kann nicht geöffnet werden, Zeilen werden nur im Speicher gepuffert: {e}")
+        return None
+
+write_queue = SheetsWriteQueue(
+    sheets_client,
+    config.SHEETS_FLUSH_INTERVAL,
+    config.SHEETS_BATCH_ROWS,
+    outbox_path=_outbox_path(),
+    replay_interval=config.SHEETS_REPLAY_INTERVAL
+)
+
+async def _queue_row(range_name, spreadsheet_id, row, row_id, wait):
+    # Always use the actual trade sheet ID from environment variable
+    future = write_queue.add(os.environ.get('TRADE_SHEET_ID', spreadsheet_id), range_name, row, row_id)
+    if not wait:
+        return None
+    try:
+        # Only the caller stops waiting; the row stays queued and journaled until Google answers
+        return await asyncio.wait_for(asyncio.shield(future), config.SHEETS_FLUSH_INTERVAL + config.SHEETS_TIMEOUT)
+    except asyncio.TimeoutError:
+        return False
+
+async def log_trade_to_sheet_async(spreadsheet_id, initiator_country, partner_country,
+                                   offer_resource, offer_amount, request_resource, request_amount,
+                                   row_id=None, wait=True):
+    """
+    Queue a trade for the ledger without blocking the event loop. row_id (e.g. "trade:<id>") keeps
+    the row from being logged twice. With wait=True this returns True/False once the batch is
+    written, otherwise None immediately (fire-and-forget; the outbox still guarantees delivery).
+    """
+    row = trade_row(initiator_country, partner_country, offer_resource, offer_amount, request_resource, request_amount)
+    return await _queue_row(TRADE_RANGE, spreadsheet_id, row, row_id, wait)
+
+async def log_ausbau_to_sheet_async(spreadsheet_id, land, ausbau_art, level, kosten, gebiet, anzahl=1,
+                                    row_id=None, wait=True):
+    """Queue a development for the ledger, like log_trade_to_sheet_async"""
+    row = ausbau_row(land, ausbau_art, level, kosten, gebiet, anzahl)
+    return await _queue_row(AUSBAU_RANGE, spreadsheet_id, row, row_id, wait)
+
+async def warm_up():
+    """Build the service and start the queue, which replays rows left over from the last run"""
+    write_queue.start()
+    await _run_in_pool(get_sheets_service)
+
+def shutdown():
+    """Write rows still waiting in the queue, then wait for running Sheets calls"""
+    write_queue.flush_sync()
+    _executor.shutdown(wait=True)
@@ -0,0 +1,97 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('discord_bot')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    row_id TEXT PRIMARY KEY,
+    spreadsheet_id TEXT NOT NULL,
+    range_name TEXT NOT NULL,
+    row_json TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (created) WHERE delivered IS NULL;
+"""
+
+class SheetsOutbox:
+    """
+    Lokales Journal (SQLite im WAL-Modus) für Tabellenzeilen: jede Zeile wird zuerst hier festgeschrieben
+    und erst nach der Antwort von Google Sheets als zugestellt markiert. Die row_id ist stabil
+    (z.B. "trade:<Trade-ID>"), dieselbe Zeile wird also nie zweimal journalisiert. Zustellung ist
+    mindestens einmal: stürzt der Bot ab, nachdem Google einen Batch angenommen hat, aber bevor er
+    als zugestellt markiert ist, wird dieser Batch nach dem Neustart noch einmal eingetragen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by the event loop and the Sheets pool threads, serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL survives a crash of the bot; only a power loss can lose the last commits
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def put(self, row_id, spreadsheet_id, range_name, row):
+        """Commit a row; returns False if row_id is already in the journal (pending or delivered)"""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO outbox (row_id, spreadsheet_id, range_name, row_json, created) VALUES (?, ?, ?, ?, ?)",
+                (row_id, spreadsheet_id, range_name, json.dumps(row), time.time())
+            )
+            return cursor.rowcount == 1
+
+    def is_delivered(self, row_id):
+        with self._lock:
+            result = self._db.execute("SELECT delivered FROM outbox WHERE row_id = ?", (row_id,)).fetchone()
+        return result is not None and result[0] is not None
+
+    def pending(self, limit=500):
+        """Undelivered rows, oldest first, as (row_id, spreadsheet_id, range_name, row)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT row_id, spreadsheet_id, range_name, row_json FROM outbox "
+                "WHERE delivered IS NULL ORDER BY created LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, spreadsheet_id, range_name, json.loads(row)) for row_id, spreadsheet_id, range_name, row in rows]
+
+    def mark_delivered(self, row_ids):
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET delivered = ? WHERE row_id = ?", [(time.time(), row_id) for row_id in row_ids])
+
+    def mark_failed(self, row_ids):
+        with self._lock:
+            self._db.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE row_id = ?", [(row_id,) for row_id in row_ids])
+
+    def prune(self, retention_days):
+        """Forget delivered rows older than retention_days"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM outbox WHERE delivered IS NOT NULL AND delivered < ?", (time.time() - retention_days * 86400,)
+            )
+        if cursor.rowcount:
+            logger.info(f"Sheets-Outbox: {cursor.rowcount} zugestellte Zeilen entfernt")
+
+    def stats(self):
+        with self._lock:
+            pending, oldest, attempts = self._db.execute(
+                "SELECT COUNT(*), MIN(created), MAX(attempts) FROM outbox WHERE delivered IS NULL"
+            ).fetchone()
+            delivered = self._db.execute("SELECT COUNT(*) FROM outbox WHERE delivered IS NOT NULL").fetchone()[0]
+        return {
+            "pending": pending,
+            "delivered": delivered,
+            "oldest_pending_s": round(time.time() - oldest, 1) if oldest else None,
+            "max_attempts": attempts or 0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,198 @@
+import base64
+import functools
+import io
+import zlib
+from xml.sax.saxutils import escape
+from utils.fonts import font_registry
+from utils.layout import FONT_FACE, SEAL_DIAMETER, EllipseOp, LineOp, TextOp
+
+# Pergament als Fläche: Grundton und Randton des Verlaufs
+PAPER = (232, 216, 178)
+PAPER_EDGE = (200, 172, 120)
+SVG_FONT = "Garamond, 'EB Garamond', 'Times New Roman', serif"
+# Layout-Pixel auf PDF-Punkte: 800 px breite Seiten werden 600 pt breit
+PDF_SCALE = 0.75
+# Kubische Bézier-Näherung eines Viertelkreises
+_KAPPA = 0.5523
+
+def _ascent(size):
+    """Distance from the top of a text op (Pillow's anchor) to its baseline"""
+    return font_registry.get(FONT_FACE, size).getmetrics()[0]
+
+def _rgb(colour):
+    return f"rgb({colour[0]},{colour[1]},{colour[2]})"
+
+@functools.lru_cache(maxsize=256)
+def _seal_uri(seals, country, size):
+    """Seal sprite as PNG data URI, encoded once per country"""
+    buffer = io.BytesIO()
+    seals(country, size).save(buffer, format="PNG", optimize=True)
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+def _seal_size():
+    return SEAL_DIAMETER + 4
+
+def svg_pages(layout, fields, seals=None):
+    """
+    Zeichnet ein Dokument als SVG, eine Datei je Seite. Text bleibt Text (durchsuchbar, skalierbar),
+    das Pergament ist ein Farbverlauf; nur die Siegel werden als kleine PNGs eingebettet.
+    """
+    width = layout.template.width
+    documents = []
+    for number, page in enumerate(layout.paginate(fields)):
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{page.height}" '
+            f'viewBox="0 0 {width} {page.height}">',
+            '<defs><radialGradient id="paper" cx="50%" cy="50%" r="75%">'
+            f'<stop offset="0.7" stop-color="{_rgb(PAPER)}"/><stop offset="1" stop-color="{_rgb(PAPER_EDGE)}"/>'
+            '</radialGradient></defs>',
+            '<rect width="100%" height="100%" fill="url(#paper)"/>',
+        ]
+        for op in layout.page_ops(page, number == 0):
+            if isinstance(op, TextOp):
+                parts.append(
+                    f'<text x="{op.x}" y="{op.y + _ascent(op.size)}" font-family="{SVG_FONT}" '
+                    f'font-size="{op.size}" fill="{_rgb(op.fill)}" xml:space="preserve">{escape(op.text)}</text>'
+                )
+            elif isinstance(op, LineOp):
+                points = " ".join(f"{x},{y}" for x, y in op.points)
+                parts.append(f'<polyline points="{points}" fill="none" stroke="{_rgb(op.fill)}" stroke-width="{op.width}"/>')
+            elif isinstance(op, EllipseOp):
+                x0, y0, x1, y1 = op.box
+                parts.append(
+                    f'<ellipse cx="{(x0 + x1) / 2}" cy="{(y0 + y1) / 2}" rx="{(x1 - x0) / 2}" ry="{(y1 - y0) / 2}" '
+                    f'fill="none" stroke="{_rgb(op.outline)}" stroke-width="{op.width}"/>'
+                )
+        if page.sign_y is not None and seals is not None:
+            size = _seal_size()
+            for country, x, y in layout.seal_positions(fields, page.sign_y):
+                parts.append(
+                    f'<image x="{x - size // 2}" y="{y - size // 2}" width="{size}" height="{size}" '
+                    f'href="{_seal_uri(seals, country, size)}"/>'
+                )
+        parts.append('</svg>')
+        documents.append("\n".join(parts).encode("utf-8"))
+    return documents
+
+def _pdf_text(text):
+    """PDF string literal in WinAnsiEncoding (covers German umlauts and ß)"""
+    data = text.encode("cp1252", errors="replace")
+    return "(" + data.decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def _pdf_colour(colour, operator):
+    return " ".join(f"{c / 255:.3f}" for c in colour) + f" {operator}"
+
+def _pdf_ellipse(box):
+    x0, y0, x1, y1 = box
+    cx, cy, rx, ry = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2
+    kx, ky = rx * _KAPPA, ry * _KAPPA
+    return (
+        f"{cx + rx} {cy} m "
+        f"{cx + rx} {cy + ky} {cx + kx} {cy + ry} {cx} {cy + ry} c "
+        f"{cx - kx} {cy + ry} {cx - rx} {cy + ky} {cx - rx} {cy} c "
+        f"{cx - rx} {cy - ky} {cx - kx} {cy - ry} {cx} {cy - ry} c "
+        f"{cx + kx} {cy - ry} {cx + rx} {cy - ky} {cx + rx} {cy} c S"
+    )
+
+class _PdfWriter:
+    """Minimal PDF 1.4 writer: numbered objects, Flate streams, cross-reference table"""
+
+    def __init__(self):
+        self.objects = []
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, number, body):
+        self.objects[number - 1] = body if isinstance(body, bytes) else body.encode("latin-1")
+
+    def add(self, body):
+        number = self.reserve()
+        self.set(number, body)
+        return number
+
+    def stream(self, data, dictionary="", compressed=False):
+        if not compressed:
+            data = zlib.compress(data)
+        return self.add(f"<< {dictionary} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode("latin-1") + data + b"\nendstream")
+
+    def output(self, root, info):
+        out = io.BytesIO()
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, 1):
+            offsets.append(out.tell())
+            out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        xref = out.tell()
+        out.write(f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            out.write(f"{offset:010d} 00000 n \n".encode())
+        out.write(f"trailer\n<< /Size {len(self.objects) + 1} /Root {root} 0 R /Info {info} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+        return out.getvalue()
+
+@functools.lru_cache(maxsize=256)
+def _seal_samples(seals, country, size):
+    """Compressed RGB and alpha samples of a seal sprite, computed once per country"""
+    image = seals(country, size)
+    return zlib.compress(image.convert("RGB").tobytes()), zlib.compress(image.getchannel("A").tobytes())
+
+def _pdf_image(writer, seals, country, size):
+    """Add a seal as image XObject with its alpha channel as soft mask"""
+    rgb, alpha = _seal_samples(seals, country, size)
+    image = f"/Type /XObject /Subtype /Image /Width {size} /Height {size} /BitsPerComponent 8"
+    mask = writer.stream(alpha, f"{image} /ColorSpace /DeviceGray", compressed=True)
+    return writer.stream(rgb, f"{image} /ColorSpace /DeviceRGB /SMask {mask} 0 R", compressed=True)
+
+def _pdf_string(text):
+    """Document info string: UTF-16 with byte order mark, so any title survives"""
+    return "<feff" + text.encode("utf-16-be").hex() + ">"
+
+def pdf_document(layout, fields, seals=None, title=None):
+    """
+    Zeichnet ein Dokument als PDF mit allen Seiten in einer Datei. Der Text ist echter Text in der
+    PDF-Standardschrift Times (durchsuchbar, druckfähig), die Siegel sind eingebettete Bilder.
+    """
+    writer = _PdfWriter()
+    catalog, pages_id = writer.reserve(), writer.reserve()
+    font = writer.add("<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman /Encoding /WinAnsiEncoding >>")
+    width = layout.template.width
+    seal_images = {}
+    page_ids = []
+    for number, page in enumerate(layout.paginate(fields)):
+        height = page.height
+        # Layout-Koordinaten (y nach unten) auf PDF-Punkte (y nach oben) abbilden
+        content = [f"{PDF_SCALE} 0 0 {-PDF_SCALE} 0 {height * PDF_SCALE} cm",
+                   _pdf_colour(PAPER, "rg"), f"0 0 {width} {height} re f"]
+        for op in layout.page_ops(page, number == 0):
+            if isinstance(op, TextOp):
+                content.append(
+                    f"BT /F1 {op.size} Tf {_pdf_colour(op.fill, 'rg')} 1 0 0 -1 {op.x} {op.y + _ascent(op.size)} Tm "
+                    f"{_pdf_text(op.text)} Tj ET"
+                )
+            elif isinstance(op, LineOp):
+                (x, y), *rest = op.points
+                path = f"{x} {y} m " + " ".join(f"{px} {py} l" for px, py in rest)
+                content.append(f"{_pdf_colour(op.fill, 'RG')} {op.width} w {path} S")
+            elif isinstance(op, EllipseOp):
+                content.append(f"{_pdf_colour(op.outline, 'RG')} {op.width} w {_pdf_ellipse(op.box)}")
+        used = []
+        if page.sign_y is not None and seals is not None:
+            size = _seal_size()
+            for country, x, y in layout.seal_positions(fields, page.sign_y):
+                if country not in seal_images:
+                    seal_images[country] = (f"/S{len(seal_images)}", _pdf_image(writer, seals, country, size))
+                name, image = seal_images[country]
+                used.append(f"{name} {image} 0 R")
+                # Bildraum (0,0)-(1,1) mit der Oberkante nach oben in die Siegelposition legen
+                content.append(f"q {size} 0 0 {-size} {x - size // 2} {y + size // 2} cm {name} Do Q")
+        stream = writer.stream("\n".join(content).encode("latin-1"))
+        xobjects = f" /XObject << {' '.join(used)} >>" if used else ""
+        page_ids.append(writer.add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {width * PDF_SCALE:g} {height * PDF_SCALE:g}] "
+            f"/Resources << /Font << /F1 {font} 0 R >>{xobjects} >> /Contents {stream} 0 R >>"
+        ))
+    writer.set(pages_id, f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(page_ids)} >>")
+    writer.set(catalog, f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    info = writer.add(f"<< /Title {_pdf_string(title or layout.template.name)} /Producer (Kurator) >>")
+    return writer.output(catalog, info)